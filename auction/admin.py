@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Auction, Bid
+from .models import Auction, Bid, AuctionSummary
 
 @admin.register(Auction)
 class AuctionAdmin(admin.ModelAdmin):
@@ -11,4 +11,9 @@ class AuctionAdmin(admin.ModelAdmin):
 class BidAdmin(admin.ModelAdmin):
     list_display = ('product', 'user', 'amount', 'created_at')
     search_fields = ('product__title', 'user__username')
-    list_filter = ('product', 'user')
\ No newline at end of file
+    list_filter = ('product', 'user')
+
+@admin.register(AuctionSummary)
+class AuctionSummaryAdmin(admin.ModelAdmin):
+    list_display = ('product', 'highest_bid', 'bid_count', 'leading_bidder', 'updated_at')
+    search_fields = ('product__title', 'leading_bidder__username')
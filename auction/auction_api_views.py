@@ -1,25 +1,30 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Max
 from decimal import Decimal, InvalidOperation
 from main.models import Product
-from .models import Bid
+from main.idempotency import idempotent
+from .models import Bid, current_bid_for
+from .bidding import place_bid, serialize_bids_for
+from .events import auction_event_stream
 import json
 
 
 @login_required
 def auction_list_api(request):
     """API endpoint to get list of all auctions in JSON format"""
-    auctions = Product.objects.filter(is_auction=True).order_by('-auction_end_time')
+    # Summary is joined in the same query, no aggregate per auction
+    auctions = (
+        Product.objects.filter(is_auction=True)
+        .select_related('auction_summary', 'user')
+        .order_by('-auction_end_time')
+    )
 
     auctions_data = []
     for auction in auctions:
-        # Get current highest bid for each auction
-        highest_bid = auction.bids.aggregate(Max('amount'))['amount__max']
-        current_bid = float(highest_bid) if highest_bid else float(auction.price)
+        current_bid = float(current_bid_for(auction))
 
         # Check if auction is still active
         is_active = auction.auction_end_time > timezone.now() if auction.auction_end_time else False
@@ -122,8 +127,24 @@ def auction_detail_api(request, product_id):
     return JsonResponse(response_data)
 
 
+@login_required
+def auction_events_api(request, product_id):
+    """Server-Sent Events stream of bids, min-bid changes and closing for one auction (short-lived, resumable)"""
+    product = get_object_or_404(
+        Product.objects.select_related('auction_summary'), id=product_id, is_auction=True
+    )
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    response = StreamingHttpResponse(
+        auction_event_stream(product, last_event_id=last_event_id), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @csrf_exempt
 @login_required
+@idempotent('place_bid', serialize=lambda request, product_id: serialize_bids_for(product_id))
 def place_bid_api(request, product_id):
     """API endpoint to place a bid"""
     if request.method != 'POST':
@@ -151,33 +172,25 @@ def place_bid_api(request, product_id):
 
         amount = Decimal(str(amount))
 
-        # Get last bid and calculate minimum bid
-        last_bid = product.bids.order_by('-amount').first()
-        increment = product.auction_increment if product.auction_increment is not None else Decimal('1')
-        min_bid = (last_bid.amount if last_bid else product.price) + increment
-
-        if amount >= min_bid:
-            # Create new bid
-            new_bid = Bid.objects.create(
-                product=product,
-                user=request.user,
-                amount=amount
-            )
-
+        result = place_bid(product.id, request.user, amount)
+        if result.ok:
+            new_bid = result.bid
             return JsonResponse({
                 'status': 'success',
-                'message': f'Your bid of Rp {amount:,.0f} has been placed!',
+                'message': result.message,
                 'bid': {
                     'id': str(new_bid.id),
                     'user_username': new_bid.user.username,
                     'amount': float(new_bid.amount),
                     'created_at': new_bid.created_at.isoformat(),
-                }
+                },
+                'min_bid': float(result.min_bid),
             })
         else:
             return JsonResponse({
                 'status': 'error',
-                'message': f'Minimum bid is Rp {min_bid:,.0f}'
+                'message': result.message,
+                'min_bid': float(result.min_bid) if result.min_bid is not None else None,
             }, status=400)
 
     except (ValueError, InvalidOperation, json.JSONDecodeError) as e:
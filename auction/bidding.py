@@ -0,0 +1,84 @@
+import threading
+from contextlib import nullcontext
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from main.models import Product
+from .models import Bid, min_bid_for
+from .events import publish_bid
+
+
+@dataclass
+class BidResult:
+    """Hasil penempatan bid, dipakai bersama oleh view HTML dan API Flutter."""
+    status: str  # 'placed', 'too_low', 'ended', 'not_found'
+    message: str
+    bid: Optional[Bid] = None
+    min_bid: Optional[Decimal] = None
+
+    @property
+    def ok(self):
+        return self.status == 'placed'
+
+
+# SQLite has no SELECT ... FOR UPDATE, so bids on the same product are serialized
+# with an in-process lock instead (SQLite deployments run a single process).
+# A fixed pool of locks striped by product id keeps memory bounded; two products
+# sharing a stripe only means their bids wait for each other briefly. Reentrant, because
+# the idempotency wrapper already holds the lock around the whole request transaction.
+LOCK_STRIPES = 64
+_product_locks = [threading.RLock() for _ in range(LOCK_STRIPES)]
+
+
+def _sqlite_product_lock(product_id):
+    return _product_locks[hash(str(product_id)) % LOCK_STRIPES]
+
+
+def serialize_bids_for(product_id):
+    """Context manager serializing bids on one product until the caller's transaction is done (no-op off SQLite)."""
+    if connection.features.has_select_for_update:
+        return nullcontext()
+    return _sqlite_product_lock(product_id)
+
+
+def place_bid(product_id, user, amount):
+    """
+    Place a bid while holding a per-product lock.
+    On PostgreSQL the product row is locked with SELECT ... FOR UPDATE, so the
+    min-bid check and the insert see the same highest bid as every other bidder.
+    """
+    amount = Decimal(str(amount))
+
+    with serialize_bids_for(product_id), transaction.atomic():
+        product = Product.objects.select_for_update().filter(pk=product_id, is_auction=True).first()
+        if product is None:
+            return BidResult(status='not_found', message='Auction not found.')
+
+        if product.auction_end_time and timezone.now() >= product.auction_end_time:
+            return BidResult(status='ended', message='This auction has ended.')
+
+        highest_amount = (
+            Bid.objects.filter(product=product)
+            .order_by('-amount')
+            .values_list('amount', flat=True)
+            .first()
+        )
+        min_bid = min_bid_for(product, highest_amount)
+
+        if amount < min_bid:
+            return BidResult(status='too_low', message=f'Minimum bid is Rp {min_bid:,.0f}', min_bid=min_bid)
+
+        new_bid = Bid.objects.create(product=product, user=user, amount=amount)
+        next_min_bid = min_bid_for(product, amount)
+        transaction.on_commit(lambda: publish_bid(product, new_bid, next_min_bid))
+
+    return BidResult(
+        status='placed',
+        message=f'Your bid of Rp {amount:,.0f} has been placed!',
+        bid=new_bid,
+        min_bid=next_min_bid,
+    )
@@ -0,0 +1,139 @@
+import json
+import time
+
+from django.utils import timezone
+
+from main.pubsub import broker
+from main.models import Product
+from .models import AuctionSummary, Bid, min_bid_for
+
+# Seconds between keep-alive comments so proxies do not drop idle streams
+HEARTBEAT_SECONDS = 15
+# One stream lives well under the gunicorn worker timeout, then the browser reconnects
+STREAM_WINDOW_SECONDS = 20
+RECONNECT_MILLISECONDS = 1000
+
+
+def auction_channel(product_id):
+    return f"auction:{product_id}"
+
+
+def _bid_payload(bid):
+    return {
+        'id': str(bid.id),
+        'user_username': bid.user.username,
+        'amount': float(bid.amount),
+        'created_at': bid.created_at.isoformat(),
+    }
+
+
+def publish_bid(product, bid, min_bid):
+    """Wake up this process's watchers of the auction; each one then reads the new bids from the database."""
+    return broker.publish(auction_channel(product.pk), {
+        'type': 'bid',
+        'bid': _bid_payload(bid),
+        'current_bid': float(bid.amount),
+        'min_bid': float(min_bid),
+    })
+
+
+def publish_closed(product_id, winner_username=None):
+    return broker.publish(auction_channel(product_id), {
+        'type': 'closed',
+        'winner_username': winner_username,
+    })
+
+
+def format_sse(event_type, data, event_id=None):
+    prefix = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{prefix}event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def _bids_after(product, seen):
+    """(bid count, SSE events) for the bids after the first `seen` of this auction."""
+    # append-only per product, so the bids after the first `seen` are the new ones
+    new_bids = list(
+        Bid.objects.filter(product_id=product.pk).select_related('user')
+        .order_by('created_at', 'id')[seen:]
+    )
+    events = []
+    for bid in new_bids:
+        seen += 1
+        # every accepted bid is above the previous one, so it is the current price
+        events.append(format_sse('bid', {
+            'type': 'bid',
+            'bid': _bid_payload(bid),
+            'current_bid': float(bid.amount),
+            'min_bid': float(min_bid_for(product, bid.amount)),
+        }, event_id=seen))
+    return seen, events
+
+
+def _parse_event_id(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def auction_event_stream(product, last_event_id=None, window=STREAM_WINDOW_SECONDS, heartbeat=HEARTBEAT_SECONDS):
+    """
+    Server-Sent Events generator for one auction, bounded to `window` seconds.
+    The database is read once on connect (snapshot, or the bids missed since
+    Last-Event-ID); after that the stream waits on the in-process broker and only
+    queries when a bid event arrives. The event id is the bid count. Bids taken by
+    another worker process wake nobody here; they are sent with the next local event,
+    or when the window ends and EventSource reconnects with Last-Event-ID.
+    """
+    seen = _parse_event_id(last_event_id)
+    started = time.monotonic()
+    last_sent = started
+
+    with broker.subscribe(auction_channel(product.pk)) as subscription:
+        yield f"retry: {RECONNECT_MILLISECONDS}\n\n"
+
+        if seen is None:
+            summary = AuctionSummary.objects.filter(product_id=product.pk).first()
+            highest_bid = summary.highest_bid if summary is not None else None
+            seen = summary.bid_count if summary is not None else 0
+            yield format_sse('snapshot', {
+                'type': 'snapshot',
+                'current_bid': float(highest_bid if highest_bid is not None else product.price),
+                'min_bid': float(min_bid_for(product, highest_bid)),
+                'auction_end_time': product.auction_end_time.isoformat() if product.auction_end_time else None,
+            }, event_id=seen)
+        else:
+            seen, missed = _bids_after(product, seen)
+            yield from missed
+
+        while True:
+            now = time.monotonic()
+            if product.auction_end_time and product.auction_end_time <= timezone.now():
+                winner = (
+                    Product.objects.filter(pk=product.pk)
+                    .values_list('auction_winner__username', flat=True).first()
+                )
+                yield format_sse('closed', {'type': 'closed', 'winner_username': winner}, event_id=seen)
+                return
+            if now - started >= window:
+                return  # EventSource reconnects with Last-Event-ID
+            if now - last_sent >= heartbeat:
+                yield ": keepalive\n\n"
+                last_sent = now
+
+            timeout = min(heartbeat - (now - last_sent), window - (now - started))
+            if product.auction_end_time:
+                timeout = min(timeout, max(0, (product.auction_end_time - timezone.now()).total_seconds()))
+            event = subscription.get(timeout=timeout)
+            if event is None:
+                continue
+            if event['type'] == 'closed':
+                yield format_sse('closed', event, event_id=seen)
+                return
+            if event['type'] == 'bid':
+                # read from the database rather than the payload: events dropped by a full
+                # queue or bids from other processes are caught up in the same query
+                seen, new_events = _bids_after(product, seen)
+                if new_events:
+                    yield from new_events
+                    last_sent = time.monotonic()
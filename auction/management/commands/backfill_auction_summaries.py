@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+from main.models import Product
+from auction.models import AuctionSummary, Bid
+
+
+class Command(BaseCommand):
+    help = 'Rebuild AuctionSummary (highest bid, bid count, leading bidder) for every auction product from existing bids'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows written per bulk upsert')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        top_bid = Bid.objects.filter(product=OuterRef('pk')).order_by('-amount', 'created_at')
+        auctions = (
+            Product.objects.filter(is_auction=True)
+            .annotate(
+                highest=Max('bids__amount'),
+                total_bids=Count('bids'),
+                leader_id=Subquery(top_bid.values('user_id')[:1]),
+            )
+            .values_list('pk', 'highest', 'total_bids', 'leader_id')
+        )
+
+        summaries = [
+            AuctionSummary(product_id=pk, highest_bid=highest, bid_count=total_bids, leading_bidder_id=leader_id)
+            for pk, highest, total_bids, leader_id in auctions.iterator()
+        ]
+
+        with transaction.atomic():
+            AuctionSummary.objects.bulk_create(
+                summaries,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['product'],
+                update_fields=['highest_bid', 'bid_count', 'leading_bidder', 'updated_at'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {len(summaries)} auction summaries."))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from auction.tasks import DEFAULT_BATCH_SIZE, settle_expired_auctions
+
+
+class Command(BaseCommand):
+    help = 'Settle every expired auction (set winner and settled time) in batches. Safe to run from several workers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Auctions settled per transaction')
+        parser.add_argument('--loop', action='store_true', help='Keep running and settle new expirations every --interval seconds')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between passes in --loop mode')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                stats = settle_expired_auctions(batch_size=options['batch_size'])
+                if stats['settled'] or not options['loop']:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Settled {stats['settled']} auctions ({stats['with_winner']} with a winner) "
+                        f"in {stats['batches']} batches, {stats['elapsed']:.2f}s "
+                        f"({stats['per_second']:.1f} auctions/s)"
+                    ))
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Settlement worker stopped.'))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0002_auctionsummary'),
+        ('main', '0013_hot_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['product', '-amount'], name='bid_product_amount_idx'),
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.utils import timezone
 from decimal import Decimal
@@ -28,6 +31,78 @@ class Bid(models.Model):
 
     class Meta:
         ordering = ['-amount', '-created_at']
+        indexes = [
+            # Highest-bid lookups and bid history per product
+            models.Index(fields=['product', '-amount'], name='bid_product_amount_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} bid {self.amount} on {self.product.title}"
\ No newline at end of file
+        return f"{self.user.username} bid {self.amount} on {self.product.title}"
+
+class AuctionSummary(models.Model):
+    """
+    Ringkasan harga per produk lelang (highest bid, jumlah bid, pemimpin lelang).
+    Diperbarui setiap ada Bid baru sehingga halaman list tidak perlu aggregate per baris.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='auction_summary')
+    highest_bid = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    bid_count = models.PositiveIntegerField(default=0)
+    leading_bidder = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='leading_auctions')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product.title}: {self.highest_bid} ({self.bid_count} bids)"
+
+    @classmethod
+    def record_bid(cls, bid):
+        """Apply one new bid to the summary using conditional UPDATEs (no read-modify-write)."""
+        with transaction.atomic():
+            cls.objects.get_or_create(product_id=bid.product_id)
+            cls.objects.filter(product_id=bid.product_id).update(
+                bid_count=F('bid_count') + 1,
+                updated_at=timezone.now(),
+            )
+            cls.objects.filter(product_id=bid.product_id).filter(
+                Q(highest_bid__isnull=True) | Q(highest_bid__lt=bid.amount)
+            ).update(highest_bid=bid.amount, leading_bidder_id=bid.user_id)
+
+    @classmethod
+    def recompute_for(cls, product_id):
+        """Rebuild the summary of one product from its bids (used after deletes)."""
+        with transaction.atomic():
+            bids = Bid.objects.filter(product_id=product_id)
+            top_bid = bids.order_by('-amount', 'created_at').first()
+            cls.objects.update_or_create(
+                product_id=product_id,
+                defaults={
+                    'highest_bid': top_bid.amount if top_bid else None,
+                    'bid_count': bids.count(),
+                    'leading_bidder_id': top_bid.user_id if top_bid else None,
+                },
+            )
+
+
+def current_bid_for(product):
+    """Highest bid from the summary, or the opening price if nobody has bid yet."""
+    summary = getattr(product, 'auction_summary', None)
+    if summary is not None and summary.highest_bid is not None:
+        return summary.highest_bid
+    return product.price
+
+
+def min_bid_for(product, highest_amount):
+    """Smallest acceptable next bid given the current highest amount (None = no bids yet)."""
+    increment = product.auction_increment if product.auction_increment is not None else Decimal('1')
+    return (highest_amount if highest_amount is not None else product.price) + increment
+
+
+@receiver(post_save, sender=Bid)
+def update_auction_summary_on_bid(sender, instance, created, **kwargs):
+    if created:
+        AuctionSummary.record_bid(instance)
+
+
+@receiver(post_delete, sender=Bid)
+def update_auction_summary_on_bid_delete(sender, instance, **kwargs):
+    if Product.objects.filter(pk=instance.product_id).exists():
+        AuctionSummary.recompute_for(instance.product_id)
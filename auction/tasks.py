@@ -1,22 +1,93 @@
+import time
+
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, OuterRef, Subquery, Value, When
 from django.utils import timezone
+
 from main.models import Product
-from django.shortcuts import redirect
-from django.urls import reverse
+from .events import publish_closed
+from .models import Bid
 
-def check_auction_end():
-    ended_auctions = Product.objects.filter(
+DEFAULT_BATCH_SIZE = 200
+
+
+def expired_auctions(now=None):
+    """Ended auctions that have not been settled yet (served by product_unsettled_end_idx)."""
+    now = now or timezone.now()
+    return Product.objects.filter(
         is_auction=True,
-        auction_end_time__lte=timezone.now(),
-        auction_winner__isnull=True
-    )
-    
-    for product in ended_auctions:
-        # Get highest bidder
-        highest_bid = product.bids.order_by('-amount').first()
-        if highest_bid:
-            product.auction_winner = highest_bid.user
-            product.save()
-            
-            # Redirect winner to checkout
-            return redirect(reverse('checkout:checkout_view') + 
-                          f'?product_id={product.id}&quantity=1')
\ No newline at end of file
+        auction_settled_at__isnull=True,
+        auction_end_time__lte=now,
+    ).order_by('auction_end_time')
+
+
+def settle_batch(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """
+    Settle up to batch_size expired auctions in one transaction.
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED where supported, and the
+    UPDATE only touches rows that are still unsettled, so several workers can run at
+    once and re-running never changes an already settled auction.
+    Returns (settled, with_winner, claimed) for this batch.
+    """
+    now = now or timezone.now()
+    top_bid = Bid.objects.filter(product=OuterRef('pk')).order_by('-amount', 'created_at')
+
+    with transaction.atomic():
+        candidates = expired_auctions(now)
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True, of=('self',))
+
+        rows = list(
+            candidates
+            .annotate(
+                winner_id=Subquery(top_bid.values('user_id')[:1]),
+                winner_username=Subquery(top_bid.values('user__username')[:1]),
+            )
+            .values_list('pk', 'winner_id', 'winner_username')[:batch_size]
+        )
+        if not rows:
+            return 0, 0, 0
+
+        winners = [When(pk=pk, then=Value(winner_id)) for pk, winner_id, _ in rows if winner_id]
+        settled = Product.objects.filter(
+            pk__in=[pk for pk, _, _ in rows],
+            auction_settled_at__isnull=True,
+        ).update(
+            auction_settled_at=now,
+            auction_winner_id=Case(*winners, default=Value(None), output_field=IntegerField()),
+        )
+
+        def notify():
+            for pk, _, winner_username in rows:
+                publish_closed(pk, winner_username)
+
+        transaction.on_commit(notify)
+
+    with_winner = sum(1 for _, winner_id, _ in rows if winner_id)
+    return settled, with_winner, len(rows)
+
+
+def settle_expired_auctions(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """Settle every expired auction in batches and return throughput metrics."""
+    now = now or timezone.now()
+    started = time.monotonic()
+    stats = {'settled': 0, 'with_winner': 0, 'batches': 0}
+
+    while True:
+        settled, with_winner, claimed = settle_batch(batch_size=batch_size, now=now)
+        if not claimed:
+            break
+        stats['batches'] += 1
+        stats['settled'] += settled
+        stats['with_winner'] += with_winner
+        if claimed < batch_size:
+            break
+
+    stats['elapsed'] = time.monotonic() - started
+    stats['per_second'] = stats['settled'] / stats['elapsed'] if stats['elapsed'] else 0.0
+    return stats
+
+
+def check_auction_end():
+    # Kept for backward compatibility; settlement now runs via `manage.py settle_auctions`
+    return settle_expired_auctions()
@@ -1,5 +1,23 @@
-from django.test import TestCase
-from .models import User, Auction, Bid
+import io
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from main.models import IdempotencyKey, Product
+from main.pubsub import Broker, broker
+from .bidding import place_bid
+from .events import auction_channel, auction_event_stream
+from .models import User, Auction, AuctionSummary, Bid
+from .tasks import settle_expired_auctions
+
 
 class AuctionModelTests(TestCase):
 
@@ -35,4 +53,322 @@ class AuctionModelTests(TestCase):
         bid = Bid.objects.create(auction=self.auction, user=self.user, bid_amount=110.00)
         self.auction.current_bid = bid.bid_amount
         self.auction.save()
-        self.assertGreater(self.auction.current_bid, self.auction.starting_price)
\ No newline at end of file
+        self.assertGreater(self.auction.current_bid, self.auction.starting_price)
+
+
+class AuctionSummaryTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', password='pass123')
+        self.bidder1 = User.objects.create_user(username='bidder1', password='pass123')
+        self.bidder2 = User.objects.create_user(username='bidder2', password='pass123')
+        self.product = self._create_auction('Air Jordan 1')
+
+    def _create_auction(self, title):
+        return Product.objects.create(
+            title=title,
+            price=Decimal('100000'),
+            user=self.seller,
+            is_auction=True,
+            auction_increment=Decimal('10000'),
+            auction_end_time=timezone.now() + timedelta(hours=1),
+        )
+
+    def test_summary_follows_new_bids(self):
+        Bid.objects.create(product=self.product, user=self.bidder1, amount=Decimal('110000'))
+        Bid.objects.create(product=self.product, user=self.bidder2, amount=Decimal('120000'))
+
+        summary = AuctionSummary.objects.get(product=self.product)
+        self.assertEqual(summary.highest_bid, Decimal('120000'))
+        self.assertEqual(summary.bid_count, 2)
+        self.assertEqual(summary.leading_bidder, self.bidder2)
+
+    def test_summary_recomputed_after_bid_delete(self):
+        Bid.objects.create(product=self.product, user=self.bidder1, amount=Decimal('110000'))
+        top = Bid.objects.create(product=self.product, user=self.bidder2, amount=Decimal('120000'))
+        top.delete()
+
+        summary = AuctionSummary.objects.get(product=self.product)
+        self.assertEqual(summary.highest_bid, Decimal('110000'))
+        self.assertEqual(summary.bid_count, 1)
+        self.assertEqual(summary.leading_bidder, self.bidder1)
+
+    def test_list_api_query_count_is_constant(self):
+        self.client.login(username='bidder1', password='pass123')
+        Bid.objects.create(product=self.product, user=self.bidder1, amount=Decimal('110000'))
+
+        with self.assertNumQueries(3):
+            self.client.get(reverse('auction:auction_list_api'))
+
+        for index in range(5):
+            product = self._create_auction(f'Lot {index}')
+            Bid.objects.create(product=product, user=self.bidder2, amount=Decimal('150000'))
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('auction:auction_list_api'))
+
+        self.assertEqual(len(response.json()['auctions']), 6)
+        current = {a['id']: a['current_bid'] for a in response.json()['auctions']}
+        self.assertEqual(current[str(self.product.id)], 110000.0)
+
+    def test_backfill_command_rebuilds_summaries(self):
+        Bid.objects.create(product=self.product, user=self.bidder1, amount=Decimal('110000'))
+        Bid.objects.create(product=self.product, user=self.bidder2, amount=Decimal('130000'))
+        other = self._create_auction('No Bids Yet')
+        AuctionSummary.objects.all().delete()
+
+        call_command('backfill_auction_summaries', stdout=io.StringIO())
+
+        summary = AuctionSummary.objects.get(product=self.product)
+        self.assertEqual(summary.highest_bid, Decimal('130000'))
+        self.assertEqual(summary.bid_count, 2)
+        self.assertEqual(summary.leading_bidder, self.bidder2)
+        self.assertEqual(AuctionSummary.objects.get(product=other).bid_count, 0)
+
+
+class BidPlacementTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', password='pass123')
+        self.bidder = User.objects.create_user(username='bidder', password='pass123')
+        self.product = Product.objects.create(
+            title='Dunk Low', price=Decimal('100000'), user=self.seller, is_auction=True,
+            auction_increment=Decimal('10000'), auction_end_time=timezone.now() + timedelta(hours=1),
+        )
+
+    def test_place_bid_enforces_min_bid(self):
+        result = place_bid(self.product.id, self.bidder, Decimal('105000'))
+        self.assertEqual(result.status, 'too_low')
+        self.assertEqual(result.min_bid, Decimal('110000'))
+
+        result = place_bid(self.product.id, self.bidder, Decimal('110000'))
+        self.assertTrue(result.ok)
+        self.assertEqual(result.bid.amount, Decimal('110000'))
+        self.assertEqual(result.min_bid, Decimal('120000'))
+
+    def test_place_bid_rejects_ended_auction(self):
+        Product.objects.filter(pk=self.product.pk).update(auction_end_time=timezone.now() - timedelta(minutes=1))
+        result = place_bid(self.product.id, self.bidder, Decimal('500000'))
+        self.assertEqual(result.status, 'ended')
+        self.assertFalse(Bid.objects.exists())
+
+    def test_place_bid_api_uses_service(self):
+        self.client.login(username='bidder', password='pass123')
+        url = reverse('auction:place_bid_api', args=[self.product.id])
+        response = self.client.post(url, json.dumps({'amount': 90000}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, json.dumps({'amount': 110000}), content_type='application/json')
+        self.assertEqual(response.json()['status'], 'success')
+
+
+class ConcurrentBidStressTests(TransactionTestCase):
+
+    def test_concurrent_bids_keep_ladder_strictly_increasing(self):
+        seller = User.objects.create_user(username='seller', password='pass123')
+        bidders = [User.objects.create_user(username=f'bidder{i}', password='pass123') for i in range(8)]
+        increment = Decimal('1000')
+        product = Product.objects.create(
+            title='Travis Scott Low', price=Decimal('100000'), user=seller, is_auction=True,
+            auction_increment=increment, auction_end_time=timezone.now() + timedelta(hours=1),
+        )
+
+        def fire(index):
+            try:
+                amount = Decimal('100000') + increment * random.randint(1, 60)
+                return place_bid(product.id, bidders[index % len(bidders)], amount).status
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            statuses = list(pool.map(fire, range(300)))
+
+        self.assertEqual(len(statuses), 300)
+        self.assertTrue(set(statuses) <= {'placed', 'too_low'})
+
+        ladder = list(Bid.objects.filter(product=product).order_by('id').values_list('amount', flat=True))
+        self.assertEqual(len(ladder), statuses.count('placed'))
+        for previous, current in zip(ladder, ladder[1:]):
+            self.assertGreaterEqual(current, previous + increment)
+
+
+class AuctionEventStreamTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', password='pass123')
+        self.bidder = User.objects.create_user(username='bidder', password='pass123')
+        self.product = Product.objects.create(
+            title='Air Max 1', price=Decimal('100000'), user=self.seller, is_auction=True,
+            auction_increment=Decimal('10000'), auction_end_time=timezone.now() + timedelta(hours=1),
+        )
+
+    def test_broker_fans_out_to_every_subscriber(self):
+        local = Broker()
+        watchers = [local.subscribe('drop') for _ in range(50)]
+        self.assertEqual(local.publish('drop', {'type': 'bid'}), 50)
+        self.assertTrue(all(w.get(timeout=0) == {'type': 'bid'} for w in watchers))
+        for watcher in watchers:
+            watcher.close()
+        self.assertEqual(local.subscriber_count('drop'), 0)
+
+    def test_stream_sends_snapshot_then_published_bids(self):
+        stream = auction_event_stream(self.product, heartbeat=0.01)
+        self.assertEqual(next(stream), 'retry: 1000\n\n')
+        snapshot = next(stream)
+        self.assertTrue(snapshot.startswith('id: 0\nevent: snapshot'))
+        self.assertIn('"min_bid": 110000.0', snapshot)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            place_bid(self.product.id, self.bidder, Decimal('110000'))
+
+        event = next(stream)
+        self.assertTrue(event.startswith('id: 1\nevent: bid'))
+        self.assertIn('"min_bid": 120000.0', event)
+        stream.close()
+        self.assertEqual(broker.subscriber_count(auction_channel(self.product.pk)), 0)
+
+    def test_reconnect_resumes_after_last_event_id_and_window_ends(self):
+        # placed without on_commit: nothing is published in-process, as if another worker took the bid
+        for amount in ('110000', '120000', '130000'):
+            place_bid(self.product.id, self.bidder, Decimal(amount))
+
+        events = list(auction_event_stream(self.product, last_event_id='1', window=0))
+        self.assertEqual([e.split('\n', 1)[0] for e in events[1:]], ['id: 2', 'id: 3'])
+        self.assertIn('"current_bid": 130000.0', events[-1])
+        self.assertFalse(any('snapshot' in e for e in events))
+
+    def test_idle_stream_waits_on_the_broker_without_querying(self):
+        stream = auction_event_stream(self.product, heartbeat=0.05)
+        self.assertEqual(next(stream), 'retry: 1000\n\n')
+        self.assertIn('event: snapshot', next(stream))
+        with self.assertNumQueries(0):
+            self.assertEqual(next(stream), ': keepalive\n\n')
+
+        # taken by another worker: picked up together with the next bid published here
+        place_bid(self.product.id, self.bidder, Decimal('110000'))
+        with self.captureOnCommitCallbacks(execute=True):
+            place_bid(self.product.id, self.bidder, Decimal('120000'))
+        with self.assertNumQueries(1):
+            self.assertTrue(next(stream).startswith('id: 1\nevent: bid'))
+            self.assertTrue(next(stream).startswith('id: 2\nevent: bid'))
+        stream.close()
+
+    def test_stream_closes_when_auction_ends(self):
+        self.product.auction_end_time = timezone.now() - timedelta(seconds=1)
+        events = list(auction_event_stream(self.product))
+        self.assertIn('event: closed', events[-1])
+
+    def test_events_endpoint_is_event_stream(self):
+        self.client.login(username='bidder', password='pass123')
+        response = self.client.get(reverse('auction:auction_events_api', args=[self.product.id]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = iter(response.streaming_content)
+        self.assertEqual(next(chunks), b'retry: 1000\n\n')
+        self.assertIn(b'event: snapshot', next(chunks))
+        response.close()
+
+
+class AuctionSettlementTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', password='pass123')
+        self.bidder = User.objects.create_user(username='bidder', password='pass123')
+
+    def _create_auction(self, title, ends_in):
+        return Product.objects.create(
+            title=title, price=Decimal('100000'), user=self.seller, is_auction=True,
+            auction_increment=Decimal('10000'), auction_end_time=timezone.now() + ends_in,
+        )
+
+    def test_settles_every_expired_auction_in_batches(self):
+        expired = [self._create_auction(f'Lot {i}', timedelta(minutes=-1)) for i in range(7)]
+        for product in expired[:4]:
+            Bid.objects.create(product=product, user=self.bidder, amount=Decimal('120000'))
+        running = self._create_auction('Still Running', timedelta(hours=1))
+
+        stats = settle_expired_auctions(batch_size=3)
+
+        self.assertEqual(stats['settled'], 7)
+        self.assertEqual(stats['with_winner'], 4)
+        self.assertEqual(stats['batches'], 3)
+        self.assertEqual(Product.objects.filter(auction_winner=self.bidder).count(), 4)
+        self.assertFalse(Product.objects.filter(is_auction=True, auction_settled_at__isnull=True).exclude(pk=running.pk).exists())
+        running.refresh_from_db()
+        self.assertIsNone(running.auction_settled_at)
+
+    def test_settlement_is_idempotent(self):
+        product = self._create_auction('Lot', timedelta(minutes=-1))
+        Bid.objects.create(product=product, user=self.bidder, amount=Decimal('120000'))
+
+        self.assertEqual(settle_expired_auctions()['settled'], 1)
+        product.refresh_from_db()
+        settled_at = product.auction_settled_at
+
+        self.assertEqual(settle_expired_auctions()['settled'], 0)
+        product.refresh_from_db()
+        self.assertEqual(product.auction_settled_at, settled_at)
+        self.assertEqual(product.auction_winner, self.bidder)
+
+    def test_settle_auctions_command_reports_throughput(self):
+        self._create_auction('Lot', timedelta(minutes=-1))
+        out = io.StringIO()
+        call_command('settle_auctions', stdout=out)
+        self.assertIn('Settled 1 auctions', out.getvalue())
+        self.assertIn('auctions/s', out.getvalue())
+
+
+class IdempotentBidTests(TestCase):
+
+    def test_retried_bid_is_not_placed_twice(self):
+        seller = User.objects.create_user(username='seller', password='pass123')
+        bidder = User.objects.create_user(username='bidder', password='pass123')
+        product = Product.objects.create(
+            title='Dunk Low', price=Decimal('100000'), user=seller, is_auction=True,
+            auction_increment=Decimal('1000'), auction_end_time=timezone.now() + timedelta(hours=1),
+        )
+        self.client.force_login(bidder)
+        url = reverse('auction:place_bid_api', args=[product.id])
+
+        responses = [
+            self.client.post(url, data=json.dumps({'amount': 101000}), content_type='application/json',
+                             HTTP_IDEMPOTENCY_KEY='bid-1')
+            for _ in range(3)
+        ]
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertEqual(len({response.json()['bid']['id'] for response in responses}), 1)
+        self.assertEqual(Bid.objects.filter(product=product).count(), 1)
+
+
+class ConcurrentIdempotentBidTests(TransactionTestCase):
+
+    def test_keyed_bids_see_each_others_committed_bids(self):
+        seller = User.objects.create_user(username='seller', password='pass123')
+        increment = Decimal('1000')
+        product = Product.objects.create(
+            title='Jordan 1', price=Decimal('100000'), user=seller, is_auction=True,
+            auction_increment=increment, auction_end_time=timezone.now() + timedelta(hours=1),
+        )
+        url = reverse('auction:place_bid_api', args=[product.id])
+        clients = []
+        for index in range(24):
+            client = Client()
+            client.force_login(User.objects.create(username=f'bidder{index}'))
+            clients.append(client)
+
+        def fire(index):
+            try:
+                amount = 100000 + 1000 * random.randint(1, 30)
+                return clients[index].post(url, data=json.dumps({'amount': amount}), content_type='application/json',
+                                           HTTP_IDEMPOTENCY_KEY=f'bid-{index}').status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            codes = list(pool.map(fire, range(24)))
+
+        self.assertTrue(set(codes) <= {200, 400}, codes)
+        ladder = list(Bid.objects.filter(product=product).order_by('created_at', 'id').values_list('amount', flat=True))
+        self.assertEqual(len(ladder), codes.count(200))
+        for previous, current in zip(ladder, ladder[1:]):
+            self.assertGreaterEqual(current, previous + increment)
+        self.assertEqual(IdempotencyKey.objects.filter(status_code=200).count(), codes.count(200))
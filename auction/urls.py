@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import auction_list, create_auction, auction_detail, bid
-from .auction_api_views import auction_list_api, auction_detail_api, place_bid_api
+from .auction_api_views import auction_list_api, auction_detail_api, place_bid_api, auction_events_api
 
 app_name = 'auction'
 
@@ -16,4 +16,5 @@ urlpatterns = [
     path('api/list/', auction_list_api, name='auction_list_api'),
     path('api/product/<uuid:product_id>/', auction_detail_api, name='auction_detail_api'),
     path('api/bid/<uuid:product_id>/', place_bid_api, name='place_bid_api'),
+    path('api/product/<uuid:product_id>/events/', auction_events_api, name='auction_events_api'),
 ]
\ No newline at end of file
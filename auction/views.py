@@ -2,21 +2,24 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.db.models import Max
 from decimal import Decimal, InvalidOperation
 from main.models import Product
-from .models import Bid
+from .models import Bid, current_bid_for
+from .bidding import place_bid
 from django.urls import reverse
 
 @login_required
 def auction_list(request):
     # Get all products that are auctions
-    auctions = Product.objects.filter(is_auction=True).order_by('-auction_end_time')
+    # Summary is joined in the same query, no aggregate per auction
+    auctions = (
+        Product.objects.filter(is_auction=True)
+        .select_related('auction_summary', 'user')
+        .order_by('-auction_end_time')
+    )
     
     for auction in auctions:
-        # Get current highest bid for each auction
-        highest_bid = auction.bids.aggregate(Max('amount'))['amount__max']
-        auction.current_bid = highest_bid if highest_bid else auction.price
+        auction.current_bid = current_bid_for(auction)
         
         # Check if auction is still active
         auction.is_active = auction.auction_end_time > timezone.now() if auction.auction_end_time else False
@@ -108,19 +111,16 @@ def bid(request, product_id):
         
     amount = request.POST.get('amount')
     if amount:
-        amount = Decimal(amount)
-        last_bid = product.bids.order_by('-amount').first()
-        increment = product.auction_increment if product.auction_increment is not None else Decimal('1')
-        min_bid = (last_bid.amount if last_bid else product.price) + increment
-        
-        if amount >= min_bid:
-            Bid.objects.create(
-                product=product,
-                user=request.user,
-                amount=amount
-            )
-            messages.success(request, f"Your bid of Rp {amount:,.0f} has been placed!")
+        try:
+            amount = Decimal(amount)
+        except InvalidOperation:
+            messages.error(request, "Invalid bid amount.")
+            return redirect('auction:auction_detail', product_id=product_id)
+
+        result = place_bid(product.id, request.user, amount)
+        if result.ok:
+            messages.success(request, result.message)
         else:
-            messages.error(request, f"Minimum bid is Rp {min_bid:,.0f}")
+            messages.error(request, result.message)
             
     return redirect('auction:auction_detail', product_id=product_id)
\ No newline at end of file
@@ -0,0 +1,56 @@
+from django.db.models import Count, OuterRef, Q, Subquery
+
+from .models import Conversation, ConversationMessage
+
+
+def inbox_queryset(user):
+    """
+    Semua percakapan milik user beserta pesan terakhir, pengirimnya dan jumlah unread,
+    diambil dalam satu query (Subquery untuk pesan terakhir + Count bersyarat).
+    """
+    last = ConversationMessage.objects.filter(conversation=OuterRef('pk')).order_by('-created_at', '-id')
+
+    return (
+        Conversation.objects
+        .filter(Q(user_a=user) | Q(user_b=user))
+        .select_related('user_a', 'user_b')
+        .annotate(
+            last_message_content=Subquery(last.values('content')[:1]),
+            last_message_time=Subquery(last.values('created_at')[:1]),
+            last_sender_id=Subquery(last.values('sender_id')[:1]),
+            last_sender_username=Subquery(last.values('sender__username')[:1]),
+            unread_count=Count(
+                'messages',
+                filter=Q(messages__is_read=False) & ~Q(messages__sender=user),
+            ),
+        )
+        .order_by('-updated_at')
+    )
+
+
+def inbox_entry(convo, user):
+    """Ubah satu baris inbox_queryset menjadi dict yang dipakai template & API."""
+    # tentukan user lain dalam percakapan ini
+    other = convo.user_a if convo.user_b_id == user.id else convo.user_b
+
+    if convo.last_message_time is not None:
+        content = (convo.last_message_content or "").strip()
+        # jika content kosong (mis. image only) tampilkan placeholder
+        last_message_text = content if content else "[gambar]"
+        last_sender_is_me = convo.last_sender_id == user.id
+        last_sender_username = "You" if last_sender_is_me else (convo.last_sender_username or "")
+    else:
+        last_message_text = ""
+        last_sender_is_me = False
+        last_sender_username = ""
+
+    return {
+        "id": convo.pk,
+        "other": other,
+        "last_message": last_message_text,
+        "last_message_time": convo.last_message_time,
+        "last_sender_is_me": last_sender_is_me,
+        "last_sender_username": last_sender_username,
+        "unread_count": convo.unread_count,
+        "updated_at": convo.updated_at,
+    }
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_message_conversation_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversationmessage',
+            index=models.Index(fields=['conversation', 'is_read', 'sender'], name='chat_msg_unread_idx'),
+        ),
+    ]
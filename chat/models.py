@@ -30,6 +30,14 @@ class ConversationMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Incremental sync & history: messages of one conversation ordered by time
+            models.Index(fields=['conversation', 'created_at'], name='chat_msg_convo_created_idx'),
+            # Unread counts: unread messages of one conversation not sent by the viewer
+            models.Index(fields=['conversation', 'is_read', 'sender'], name='chat_msg_unread_idx'),
+        ]
+
     def __str__(self):
         text = (self.content or "")[:20]
         if self.image and not text:
@@ -1,7 +1,10 @@
 import io
 import json
+import threading
+import time
 import uuid
-from django.test import TestCase, Client
+from django.db import connections
+from django.test import TestCase, Client, TransactionTestCase
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -167,3 +170,193 @@ class ConversationModelTests(TestCase):
             conversation=self.convo, sender=self.user1
         )
         self.assertIn("alice", str(msg))
+
+
+class MessageSyncTests(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="alice", password="pass123")
+        self.user2 = User.objects.create_user(username="bob", password="pass123")
+        self.client.login(username="alice", password="pass123")
+        self.convo = Conversation.objects.create(user_a=self.user1, user_b=self.user2)
+        self.messages = [
+            ConversationMessage.objects.create(conversation=self.convo, sender=self.user2, content=f"pesan {i}")
+            for i in range(5)
+        ]
+        self.fetch_url = reverse("chat:api_fetch_messages", args=[self.convo.pk])
+        self.history_url = reverse("chat:api_message_history", args=[self.convo.pk])
+
+    def test_after_returns_only_newer_messages(self):
+        response = self.client.get(self.fetch_url, {"after": str(self.messages[2].id)})
+        data = response.json()
+        self.assertEqual([m["content"] for m in data["messages"]], ["pesan 3", "pesan 4"])
+        self.assertEqual(data["cursor"], str(self.messages[4].id))
+
+        # Only the delivered messages are marked read
+        self.assertFalse(ConversationMessage.objects.get(pk=self.messages[0].pk).is_read)
+        self.assertTrue(ConversationMessage.objects.get(pk=self.messages[4].pk).is_read)
+
+        response = self.client.get(self.fetch_url, {"after": data["cursor"]})
+        self.assertEqual(response.json()["messages"], [])
+        self.assertEqual(response.json()["cursor"], data["cursor"])
+
+    def test_after_accepts_timestamp(self):
+        after = self.messages[3].created_at.isoformat()
+        response = self.client.get(self.fetch_url, {"after": after})
+        self.assertEqual([m["content"] for m in response.json()["messages"]], ["pesan 4"])
+
+    def test_after_rejects_unknown_cursor(self):
+        response = self.client.get(self.fetch_url, {"after": "bukan-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_history_pages_backwards(self):
+        first = self.client.get(self.history_url, {"limit": 2}).json()
+        self.assertEqual([m["content"] for m in first["messages"]], ["pesan 3", "pesan 4"])
+        self.assertTrue(first["has_more"])
+
+        second = self.client.get(self.history_url, {"limit": 2, "before": first["cursor"]}).json()
+        self.assertEqual([m["content"] for m in second["messages"]], ["pesan 1", "pesan 2"])
+
+        last = self.client.get(self.history_url, {"limit": 2, "before": second["cursor"]}).json()
+        self.assertEqual([m["content"] for m in last["messages"]], ["pesan 0"])
+        self.assertFalse(last["has_more"])
+
+
+class LongPollTests(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="alice", password="pass123")
+        self.user2 = User.objects.create_user(username="bob", password="pass123")
+        self.client.login(username="alice", password="pass123")
+        self.convo = Conversation.objects.create(user_a=self.user1, user_b=self.user2)
+        self.msg = ConversationMessage.objects.create(conversation=self.convo, sender=self.user2, content="Halo")
+        self.wait_url = reverse("chat:api_wait_messages", args=[self.convo.pk])
+
+    def test_returns_immediately_when_messages_pending(self):
+        response = self.client.get(self.wait_url, {"timeout": 5})
+        self.assertEqual([m["content"] for m in response.json()["messages"]], ["Halo"])
+
+    def test_times_out_with_empty_result(self):
+        started = time.monotonic()
+        response = self.client.get(self.wait_url, {"after": str(self.msg.id), "timeout": 0.2})
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual(response.json(), {"messages": [], "cursor": str(self.msg.id)})
+
+    def test_forbidden_for_non_participant(self):
+        User.objects.create_user(username="eve", password="pass123")
+        self.client.login(username="eve", password="pass123")
+        self.assertEqual(self.client.get(self.wait_url, {"timeout": 0}).status_code, 403)
+
+
+class LongPollDeliveryTests(TransactionTestCase):
+    def test_send_wakes_up_waiting_request(self):
+        alice = User.objects.create_user(username="alice", password="pass123")
+        bob = User.objects.create_user(username="bob", password="pass123")
+        convo = Conversation.objects.create(user_a=alice, user_b=bob)
+        first = ConversationMessage.objects.create(conversation=convo, sender=alice, content="Ping")
+
+        receiver = Client()
+        receiver.force_login(alice)
+        sender = Client()
+        sender.force_login(bob)
+
+        def send_later():
+            try:
+                time.sleep(0.3)
+                sender.post(reverse("chat:api_send_message", args=[convo.pk]), {"content": "Pong"})
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=send_later)
+        started = time.monotonic()
+        thread.start()
+        response = receiver.get(
+            reverse("chat:api_wait_messages", args=[convo.pk]),
+            {"after": str(first.id), "timeout": 10},
+        )
+        elapsed = time.monotonic() - started
+        thread.join()
+
+        self.assertEqual([m["content"] for m in response.json()["messages"]], ["Pong"])
+        self.assertLess(elapsed, 5)
+
+    def test_message_from_another_worker_is_found_by_recheck(self):
+        alice = User.objects.create_user(username="alice", password="pass123")
+        bob = User.objects.create_user(username="bob", password="pass123")
+        convo = Conversation.objects.create(user_a=alice, user_b=bob)
+        first = ConversationMessage.objects.create(conversation=convo, sender=alice, content="Ping")
+        receiver = Client()
+        receiver.force_login(alice)
+
+        def insert_later():
+            # written straight to the database: no broker publish reaches this process
+            try:
+                time.sleep(0.3)
+                ConversationMessage.objects.create(conversation=convo, sender=bob, content="Dari worker lain")
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=insert_later)
+        started = time.monotonic()
+        thread.start()
+        response = receiver.get(
+            reverse("chat:api_wait_messages", args=[convo.pk]),
+            {"after": str(first.id), "timeout": 10},
+        )
+        elapsed = time.monotonic() - started
+        thread.join()
+
+        self.assertEqual([m["content"] for m in response.json()["messages"]], ["Dari worker lain"])
+        self.assertLess(elapsed, 4)
+
+
+class InboxQueryTests(TestCase):
+    def setUp(self):
+        self.me = User.objects.create_user(username="alice", password="pass123")
+        self.client.login(username="alice", password="pass123")
+        self.list_api = reverse("chat:api_conversation_list")
+
+    def _add_conversation(self, index, unread=2):
+        other = User.objects.create_user(username=f"friend{index}", password="pass123")
+        convo = Conversation.objects.create(user_a=self.me, user_b=other)
+        ConversationMessage.objects.create(conversation=convo, sender=self.me, content="Halo")
+        for i in range(unread):
+            ConversationMessage.objects.create(conversation=convo, sender=other, content=f"Balasan {i}")
+        return convo
+
+    def _get(self, url, params=None):
+        response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_inbox_entries(self):
+        convo = self._add_conversation(1, unread=3)
+        data = self.client.get(self.list_api).json()["conversations"]
+        self.assertEqual(data[0]["id"], str(convo.pk))
+        self.assertEqual(data[0]["other_username"], "friend1")
+        self.assertEqual(data[0]["last_message"], "Balasan 2")
+        self.assertEqual(data[0]["unread_count"], 3)
+
+    def test_query_count_is_constant(self):
+        self._add_conversation(1)
+        with self.assertNumQueries(3):
+            self._get(self.list_api)
+        with self.assertNumQueries(4):
+            self._get(reverse("chat:conversation_list"))
+
+        for index in range(2, 12):
+            self._add_conversation(index)
+        with self.assertNumQueries(3):
+            response = self._get(self.list_api)
+        with self.assertNumQueries(4):
+            self._get(reverse("chat:conversation_list"))
+
+        self.assertEqual(len(response.json()["conversations"]), 11)
+
+    def test_api_pagination(self):
+        for index in range(5):
+            self._add_conversation(index, unread=0)
+        first = self.client.get(self.list_api, {"limit": 3}).json()
+        self.assertEqual(len(first["conversations"]), 3)
+        self.assertTrue(first["has_more"])
+        second = self.client.get(self.list_api, {"limit": 3, "offset": first["next_offset"]}).json()
+        self.assertEqual(len(second["conversations"]), 2)
+        self.assertFalse(second["has_more"])
@@ -1,5 +1,7 @@
 # main/views.py
 import json
+import time
+import uuid
 from django.shortcuts import render, get_object_or_404, redirect
 from django.http import JsonResponse, HttpResponseForbidden, HttpResponseBadRequest
 from django.views.decorators.http import require_POST
@@ -11,7 +13,11 @@ from django.core.exceptions import MultipleObjectsReturned
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt 
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from main.pubsub import broker
 from .models import Conversation, ConversationMessage
+from .inbox import inbox_queryset, inbox_entry
 
 @login_required
 def create_conversation_page(request):
@@ -24,41 +30,7 @@ def conversation_list(request):
     Menyusun list 'conversations' agar template bisa mengakses convo.other,
     last_message, last_sender_is_me, last_sender_username, unread_count, id.
     """
-    raw_convos = Conversation.objects.filter(Q(user_a=request.user) | Q(user_b=request.user)).order_by('-updated_at')[:200]
-
-    conversations = []
-    for convo in raw_convos:
-        # tentukan user lain dalam percakapan ini
-        other = convo.user_a if convo.user_b == request.user else convo.user_b
-
-        # pesan terakhir (ambil object terakhir bila ada)
-        last_obj = convo.messages.order_by('-created_at').first()
-        if last_obj:
-            # jika content kosong (mis. image only) tampilkan placeholder
-            last_message_text = last_obj.content.strip() if (last_obj.content and last_obj.content.strip()) else "[gambar]"
-            last_sender_is_me = (last_obj.sender_id == request.user.id)
-            # nama pengirim untuk preview; jika pengirim adalah current user kita set "You" agar lebih jelas
-            last_sender_username = "You" if last_sender_is_me else (last_obj.sender.username if last_obj.sender else "")
-            last_message_time = last_obj.created_at
-        else:
-            last_message_text = ""
-            last_sender_is_me = False
-            last_sender_username = ""
-            last_message_time = None
-
-        # hitung unread dari pihak lain
-        unread_count = convo.messages.exclude(sender=request.user).filter(is_read=False).count()
-
-        conversations.append({
-            "id": convo.pk,
-            "other": other,
-            "last_message": last_message_text,
-            "last_message_time": last_message_time,
-            "last_sender_is_me": last_sender_is_me,
-            "last_sender_username": last_sender_username,
-            "unread_count": unread_count,
-            "updated_at": convo.updated_at,
-        })
+    conversations = [inbox_entry(convo, request.user) for convo in inbox_queryset(request.user)[:200]]
 
     return render(request, "chat_list.html", {"conversations": conversations})
 
@@ -109,11 +81,112 @@ def create_conversation(request):
     return redirect('chat:conversation_view', convo.pk)
 
 
+INBOX_PAGE_SIZE = 50
+INBOX_MAX_PAGE_SIZE = 200
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+# Long-poll parks a worker thread, keep it below typical proxy/gunicorn timeouts
+LONG_POLL_TIMEOUT = 10
+LONG_POLL_MAX_TIMEOUT = 15
+# The broker only sees messages sent through this process; messages sent through
+# other workers are found by re-reading the database at least this often
+LONG_POLL_RECHECK_SECONDS = 1.5
+
+
+def conversation_channel(convo_id):
+    return f"chat:{convo_id}"
+
+
+def _serialize_message(m, user):
+    return {
+        "id": str(m.id),
+        "sender_id": m.sender_id,
+        "sender_username": "You" if m.sender_id == user.id else m.sender.username,
+        "content": m.content,
+        "image_url": m.image.url if m.image else None,
+        "created_at": m.created_at.isoformat(),
+        "is_read": m.is_read,
+    }
+
+
+def _message_anchor(convo, value):
+    """
+    Ubah nilai cursor (id pesan atau timestamp ISO) menjadi (created_at, id).
+    id bisa None bila cursor berupa timestamp. Raise ValueError bila tidak valid.
+    """
+    try:
+        message_id = uuid.UUID(value)
+    except ValueError:
+        timestamp = parse_datetime(value)
+        if timestamp is None:
+            raise ValueError("cursor must be a message id or an ISO timestamp")
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+        return timestamp, None
+
+    created_at = convo.messages.filter(pk=message_id).values_list('created_at', flat=True).first()
+    if created_at is None:
+        raise ValueError("message not found in this conversation")
+    return created_at, message_id
+
+
+def _newer_than(anchor):
+    created_at, message_id = anchor
+    if message_id is None:
+        return Q(created_at__gt=created_at)
+    return Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+
+
+def _older_than(anchor):
+    created_at, message_id = anchor
+    if message_id is None:
+        return Q(created_at__lt=created_at)
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+
+
+def _messages_after(convo, user, after):
+    """
+    Pesan yang lebih baru dari cursor `after`, urut lama -> baru, dan tandai yang
+    dikirim pihak lain sebagai sudah dibaca. Raise ValueError bila cursor tidak valid.
+    """
+    messages = convo.messages.select_related('sender').order_by('created_at', 'id')
+    if after:
+        messages = messages.filter(_newer_than(_message_anchor(convo, after)))
+    messages = list(messages)
+
+    # Only the messages delivered in this response become read
+    unread_ids = [m.id for m in messages if not m.is_read and m.sender_id != user.id]
+    if unread_ids:
+        ConversationMessage.objects.filter(pk__in=unread_ids).update(is_read=True)
+    return messages
+
+
+def _sync_response(messages, user, after):
+    data = [_serialize_message(m, user) for m in messages]
+    cursor = data[-1]["id"] if data else after
+    return JsonResponse({"messages": data, "cursor": cursor})
+
+
 def api_fetch_messages(request, convo_id):
+    """
+    Tanpa parameter: kembalikan seluruh riwayat (perilaku lama, untuk klien lama).
+    Dengan ?after=<message id | ISO timestamp>: hanya pesan yang lebih baru dari cursor,
+    dan hanya pesan tersebut yang ditandai sudah dibaca.
+    """
     convo = get_object_or_404(Conversation, pk=convo_id)
     if request.user not in convo.participants():
         return JsonResponse({"error": "not allowed"}, status=403)
 
+    after = request.GET.get('after')
+    if after:
+        try:
+            messages = _messages_after(convo, request.user, after)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return _sync_response(messages, request.user, after)
+
     # Mark all messages in this conversation as read for the current user
     # (only mark those sent by others and not already read)
     try:
@@ -122,19 +195,78 @@ def api_fetch_messages(request, convo_id):
         # If marking fails, proceed to still return messages
         pass
 
-    messages = convo.messages.order_by('created_at').all()
-    data = []
-    for m in messages:
-        data.append({
-            "id": str(m.id),
-            "sender_id": m.sender_id,
-            "sender_username": "You" if m.sender_id == request.user.id else m.sender.username,
-            "content": m.content,
-            "image_url": m.image.url if m.image else None,
-            "created_at": m.created_at.isoformat(),
-            "is_read": m.is_read,
-        })
-    return JsonResponse({"messages": data})
+    messages = convo.messages.select_related('sender').order_by('created_at', 'id')
+    return _sync_response(messages, request.user, after)
+
+
+def api_wait_messages(request, convo_id):
+    """
+    Long-poll: tunggu sampai ada pesan baru setelah ?after=<cursor>, maksimal ?timeout= detik.
+    Pesan yang sudah ada dikembalikan langsung; kalau belum ada, request menunggu di broker
+    (bangun segera untuk pesan dari proses ini) dan membaca ulang database setiap
+    LONG_POLL_RECHECK_SECONDS untuk pesan dari worker lain. Respon sama dengan api_fetch_messages.
+    """
+    convo = get_object_or_404(Conversation, pk=convo_id)
+    if request.user not in convo.participants():
+        return JsonResponse({"error": "not allowed"}, status=403)
+
+    after = request.GET.get('after')
+    try:
+        timeout = float(request.GET.get('timeout', LONG_POLL_TIMEOUT))
+    except ValueError:
+        return JsonResponse({"error": "timeout must be a number"}, status=400)
+    timeout = max(0.0, min(timeout, LONG_POLL_MAX_TIMEOUT))
+
+    # Subscribe before reading so a message sent in between is not missed
+    with broker.subscribe(conversation_channel(convo.pk)) as subscription:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                messages = _messages_after(convo, request.user, after)
+            except ValueError as e:
+                return JsonResponse({"error": str(e)}, status=400)
+
+            remaining = deadline - time.monotonic()
+            if messages or remaining <= 0:
+                return _sync_response(messages, request.user, after)
+
+            subscription.get(timeout=min(remaining, LONG_POLL_RECHECK_SECONDS))
+
+
+def api_message_history(request, convo_id):
+    """
+    Riwayat pesan mundur per halaman: ?before=<message id | ISO timestamp>&limit=N.
+    Pesan dikembalikan urut lama -> baru; pakai 'cursor' untuk halaman sebelumnya.
+    """
+    convo = get_object_or_404(Conversation, pk=convo_id)
+    if request.user not in convo.participants():
+        return JsonResponse({"error": "not allowed"}, status=403)
+
+    try:
+        limit = int(request.GET.get('limit', HISTORY_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({"error": "limit must be a number"}, status=400)
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+
+    messages = convo.messages.select_related('sender').order_by('-created_at', '-id')
+    before = request.GET.get('before')
+    if before:
+        try:
+            messages = messages.filter(_older_than(_message_anchor(convo, before)))
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+    page = list(messages[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    page.reverse()
+
+    data = [_serialize_message(m, request.user) for m in page]
+    return JsonResponse({
+        "messages": data,
+        "cursor": data[0]["id"] if data else None,
+        "has_more": has_more,
+    })
 
 # --- API: send message (supports image) ---
 @csrf_exempt
@@ -163,6 +295,9 @@ def api_send_message(request, convo_id):
     # update convo updated_at
     Conversation.objects.filter(pk=convo.pk).update(updated_at=msg.created_at)
 
+    # wake up long-poll listeners once the message is committed
+    transaction.on_commit(lambda: broker.publish(conversation_channel(convo.pk), {"type": "message", "id": str(msg.id)}))
+
     return JsonResponse({"ok": True, "id": str(msg.id)})
 
 @csrf_exempt
@@ -215,29 +350,32 @@ def api_create_conversation(request):
 def api_conversation_list(request):
     """
     API untuk mengambil daftar percakapan user dalam format JSON.
+    Paginasi: ?limit=<jumlah, default 50>&offset=<mulai dari>.
     """
-    raw_convos = Conversation.objects.filter(Q(user_a=request.user) | Q(user_b=request.user)).order_by('-updated_at')
-    
+    try:
+        limit = int(request.GET.get('limit', INBOX_PAGE_SIZE))
+        offset = int(request.GET.get('offset', 0))
+    except ValueError:
+        return JsonResponse({"error": "limit and offset must be numbers"}, status=400)
+    limit = max(1, min(limit, INBOX_MAX_PAGE_SIZE))
+    offset = max(0, offset)
+
+    page = list(inbox_queryset(request.user)[offset:offset + limit + 1])
+    has_more = len(page) > limit
+
     data = []
-    for convo in raw_convos:
-        other = convo.user_a if convo.user_b == request.user else convo.user_b
-        
-        last_obj = convo.messages.order_by('-created_at').first()
-        last_message_text = ""
-        last_message_time = None
-        
-        if last_obj:
-            last_message_text = last_obj.content.strip() if (last_obj.content and last_obj.content.strip()) else "[gambar]"
-            last_message_time = last_obj.created_at.isoformat()
-        
-        unread_count = convo.messages.exclude(sender=request.user).filter(is_read=False).count()
-        
+    for convo in page[:limit]:
+        entry = inbox_entry(convo, request.user)
         data.append({
             "id": str(convo.pk),
-            "other_username": other.username,
-            "last_message": last_message_text,
-            "last_message_time": last_message_time,
-            "unread_count": unread_count,
+            "other_username": entry["other"].username,
+            "last_message": entry["last_message"],
+            "last_message_time": entry["last_message_time"].isoformat() if entry["last_message_time"] else None,
+            "unread_count": entry["unread_count"],
         })
-        
-    return JsonResponse({"conversations": data})
\ No newline at end of file
+
+    return JsonResponse({
+        "conversations": data,
+        "has_more": has_more,
+        "next_offset": offset + limit if has_more else None,
+    })
\ No newline at end of file
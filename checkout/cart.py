@@ -0,0 +1,48 @@
+CART_SESSION_KEY = 'cart'
+MAX_CART_LINES = 50
+
+
+class Cart:
+    """
+    Keranjang belanja yang disimpan di session: {product_id: quantity}.
+    Tidak butuh tabel sendiri; isinya divalidasi ulang saat checkout.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._lines = session.get(CART_SESSION_KEY, {})
+
+    def _save(self):
+        self.session[CART_SESSION_KEY] = self._lines
+        self.session.modified = True
+
+    def add(self, product_id, quantity=1):
+        key = str(product_id)
+        self._lines[key] = self._lines.get(key, 0) + quantity
+        self._save()
+
+    def set(self, product_id, quantity):
+        key = str(product_id)
+        if quantity > 0:
+            self._lines[key] = quantity
+        else:
+            self._lines.pop(key, None)
+        self._save()
+
+    def remove(self, product_id):
+        self._lines.pop(str(product_id), None)
+        self._save()
+
+    def clear(self):
+        self._lines = {}
+        self._save()
+
+    def lines(self):
+        """[(product_id, quantity)] in the order they were added."""
+        return list(self._lines.items())
+
+    def __contains__(self, product_id):
+        return str(product_id) in self._lines
+
+    def __len__(self):
+        return len(self._lines)
@@ -0,0 +1,138 @@
+import threading
+import uuid
+from contextlib import nullcontext
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional
+
+from django.db import connection, transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.db.models.functions import Now
+
+from main.models import Product
+from main.signals import products_updated
+from .models import Order, OrderItem
+
+# Ongkir per jenis pengiriman; web dan aplikasi Flutter memakai kode yang berbeda
+WEB_SHIPPING_FEES = {'CEPAT': Decimal('10000'), 'SAMEDAY': Decimal('20000'), 'SAME_DAY': Decimal('20000')}
+API_SHIPPING_FEES = {'NEXTDAY': Decimal('10000'), 'SAMEDAY': Decimal('15000')}
+INSURANCE_FEE = Decimal('5000')
+
+
+@dataclass
+class OrderResult:
+    """Hasil pembuatan order, dipakai bersama oleh checkout web dan API Flutter."""
+    status: str  # 'placed', 'out_of_stock', 'auction', 'not_found', 'invalid'
+    message: str
+    order: Optional[Order] = None
+
+    @property
+    def ok(self):
+        return self.status == 'placed'
+
+
+# SQLite allows a single writer at a time and has no SELECT ... FOR UPDATE, so order
+# placement is serialized in-process there; PostgreSQL relies on the conditional UPDATE.
+# Reentrant: the idempotency wrapper holds it around the whole request transaction.
+_sqlite_write_lock = threading.RLock()
+
+
+def serialize_orders():
+    """Context manager serializing order placement until the caller's transaction is done (no-op off SQLite)."""
+    if connection.features.has_select_for_update:
+        return nullcontext()
+    return _sqlite_write_lock
+
+
+def order_total(lines, shipping_type, insurance, shipping_fees):
+    """Total of (price, quantity) lines plus shipping and insurance."""
+    total = sum((Decimal(price) * quantity for price, quantity in lines), Decimal('0'))
+    total += shipping_fees.get(shipping_type, Decimal('0'))
+    if insurance:
+        total += INSURANCE_FEE
+    return total
+
+
+def place_order(user, product_id, quantity, **details):
+    """Order for a single product (checkout page and Flutter place_order)."""
+    return place_cart_order(user, [(product_id, quantity)], **details)
+
+
+def place_cart_order(user, lines, *, address='', payment_method='EWALLET', shipping_type='BIASA',
+                     insurance=False, note='', shipping_fees=WEB_SHIPPING_FEES):
+    """
+    Create one order for many (product_id, quantity) lines and take all stock in one transaction.
+    The product rows are locked in pk order (so two carts cannot deadlock) and every stock is
+    decremented by a single conditional UPDATE (stock >= quantity per product); if any product
+    runs short nothing is written. No product row is rewritten as a whole.
+    """
+    wanted = {}
+    for product_id, quantity in lines:
+        # per line, before duplicates are merged: (a, 5), (a, -3) is not an order for 2
+        if quantity < 1:
+            return OrderResult(status='invalid', message='Quantity must be at least 1.')
+        try:
+            key = uuid.UUID(str(product_id))
+        except ValueError:
+            return OrderResult(status='not_found', message='Product not found.')
+        wanted[key] = wanted.get(key, 0) + quantity
+
+    if not wanted:
+        return OrderResult(status='invalid', message='Cart is empty.')
+
+    with serialize_orders(), transaction.atomic():
+        products = list(
+            Product.objects.select_for_update()
+            .filter(pk__in=list(wanted))
+            .order_by('pk')
+            .only('id', 'title', 'price', 'stock', 'is_auction')
+        )
+        if len(products) != len(wanted):
+            return OrderResult(status='not_found', message='Product not found.')
+        if any(product.is_auction for product in products):
+            return OrderResult(status='auction', message='Auction products cannot be purchased directly.')
+
+        short = [product.title for product in products if product.stock < wanted[product.pk]]
+        if short:
+            return OrderResult(status='out_of_stock', message=f"Not enough stock for: {', '.join(short)}.")
+
+        available = Q()
+        for product_id, quantity in wanted.items():
+            available |= Q(pk=product_id, stock__gte=quantity)
+        taken = Product.objects.filter(available, is_auction=False).update(
+            stock=Case(
+                *[When(pk=pk, then=F('stock') - qty) for pk, qty in wanted.items()],
+                default=F('stock'), output_field=PositiveIntegerField(),
+            ),
+            count_sold=Case(
+                *[When(pk=pk, then=F('count_sold') + qty) for pk, qty in wanted.items()],
+                default=F('count_sold'), output_field=PositiveIntegerField(),
+            ),
+            updated_at=Now(),
+        )
+        if taken != len(wanted):
+            transaction.set_rollback(True)
+            return OrderResult(status='out_of_stock', message='Not enough stock.')
+
+        order = Order.objects.create(
+            user=user,
+            total_price=order_total(
+                [(product.price, wanted[product.pk]) for product in products],
+                shipping_type, insurance, shipping_fees,
+            ),
+            address=address,
+            payment_method=payment_method,
+            shipping_type=shipping_type,
+            insurance=insurance,
+            note=note,
+            status='PAID',
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=wanted[product.pk], price=product.price)
+            for product in products
+        ])
+
+        # UPDATE tidak memicu post_save; listener (mis. autocomplete) menyegarkan stok/count_sold sendiri
+        products_updated.send(sender=Product, product_ids=list(wanted))
+
+    return OrderResult(status='placed', message='Order placed.', order=order)
@@ -8,6 +8,16 @@ from decimal import Decimal
 from main.models import Product
 from checkout.models import Order, OrderItem
 from checkout.forms import OrderForm
+import json
+from datetime import timedelta
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from django.db import DatabaseError, connection, connections
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from main.models import IdempotencyKey
+from checkout.services import place_cart_order, place_order
 
 class CheckoutTestCase(TestCase):
     def setUp(self):
@@ -104,3 +114,217 @@ class CheckoutTestCase(TestCase):
 
         form_invalid = OrderForm(data={'address': ''})
         self.assertFalse(form_invalid.is_valid())
+
+
+class OrderPlacementTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', password='test123')
+        self.product = Product.objects.create(title="Sepatu Lari", price=Decimal('200000'), stock=3, count_sold=5)
+
+    def test_order_takes_stock_without_rewriting_other_columns(self):
+        stale = Product.objects.get(pk=self.product.pk)
+        Product.objects.filter(pk=self.product.pk).update(title="Sepatu Lari v2")
+
+        result = place_order(self.buyer, stale.pk, 2, address="Jl. Test", shipping_type='CEPAT')
+        self.assertTrue(result.ok)
+        self.assertEqual(result.order.total_price, Decimal('410000'))
+
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.count_sold), (1, 7))
+        self.assertEqual(self.product.title, "Sepatu Lari v2")
+
+    def test_out_of_stock_creates_nothing(self):
+        result = place_order(self.buyer, self.product.pk, 4, address="Jl. Test")
+        self.assertEqual(result.status, 'out_of_stock')
+        self.assertFalse(Order.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+    def test_invalid_quantity_and_unknown_product(self):
+        self.assertEqual(place_order(self.buyer, self.product.pk, 0).status, 'invalid')
+        self.assertEqual(place_order(self.buyer, 'not-a-uuid', 1).status, 'not_found')
+
+    def test_api_reports_out_of_stock(self):
+        self.client.force_login(self.buyer)
+        response = self.client.post(reverse('checkout:place_order'), {'product_id': self.product.pk, 'quantity': 5})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], "Stok tidak cukup")
+
+
+class ConcurrentCheckoutStressTests(TransactionTestCase):
+
+    def test_flash_sale_never_oversells(self):
+        buyers = [User.objects.create_user(username=f'buyer{i}', password='test123') for i in range(8)]
+        product = Product.objects.create(title="Limited Drop", price=Decimal('1500000'), stock=25)
+
+        def buy(index):
+            try:
+                return place_order(buyers[index % len(buyers)], product.pk, 1 + index % 2, address="Jl. Test").status
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            statuses = list(pool.map(buy, range(120)))
+
+        product.refresh_from_db()
+        sold = sum(item.quantity for item in OrderItem.objects.filter(product=product))
+        self.assertTrue(set(statuses) <= {'placed', 'out_of_stock'})
+        self.assertEqual(Order.objects.count(), statuses.count('placed'))
+        self.assertEqual(product.stock + sold, 25)
+        self.assertGreaterEqual(product.stock, 0)
+        self.assertEqual(product.count_sold, sold)
+
+
+class CartCheckoutTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', password='test123')
+        self.client.force_login(self.buyer)
+        self.products = [
+            Product.objects.create(title=f"Sepatu {i}", price=Decimal('100000') * (i + 1), stock=5)
+            for i in range(5)
+        ]
+
+    def _add(self, product, quantity=1):
+        return self.client.post(reverse('checkout:cart_add_api'), {'product_id': product.pk, 'quantity': quantity})
+
+    def test_cart_add_update_and_view(self):
+        self._add(self.products[0], 2)
+        self._add(self.products[0], 1)
+        self._add(self.products[1])
+        self.client.post(reverse('checkout:cart_update_api'), {'product_id': self.products[1].pk, 'quantity': 0})
+
+        data = self.client.get(reverse('checkout:cart_api')).json()
+        self.assertEqual([(item['title'], item['quantity']) for item in data['items']], [("Sepatu 0", 3)])
+        self.assertEqual(Decimal(data['subtotal']), Decimal('300000'))
+
+    def test_cart_checkout_places_one_order_with_one_stock_update(self):
+        for product in self.products:
+            self._add(product, 2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('checkout:cart_checkout_api'), {'address': 'Jl. Test'})
+        product_writes = [q for q in ctx.captured_queries if 'UPDATE "main_product"' in q['sql']]
+        self.assertEqual(len(product_writes), 1)
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(pk=response.json()['order_id'])
+        self.assertEqual(order.items.count(), 5)
+        self.assertEqual(order.total_price, sum(Decimal('100000') * (i + 1) * 2 for i in range(5)))
+        self.assertEqual(list(Product.objects.order_by('price').values_list('stock', flat=True)), [3] * 5)
+        self.assertEqual(self.client.get(reverse('checkout:cart_api')).json()['items'], [])
+
+    def test_shortage_on_one_item_rolls_back_everything(self):
+        lines = [{'product_id': str(self.products[0].pk), 'quantity': 1},
+                 {'product_id': str(self.products[1].pk), 'quantity': 6}]
+        response = self.client.post(
+            reverse('checkout:cart_checkout_api'),
+            data=json.dumps({'items': lines, 'address': 'Jl. Test'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Sepatu 1", response.json()['message'])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(list(Product.objects.values_list('stock', flat=True).distinct()), [5])
+
+    def test_each_line_needs_a_positive_quantity(self):
+        product = self.products[0]
+        result = place_cart_order(self.buyer, [(product.pk, 5), (product.pk, -3)], address='Jl. Test')
+        self.assertEqual(result.status, 'invalid')
+        self.assertFalse(Order.objects.exists())
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 5)
+
+    def test_auction_products_cannot_be_added(self):
+        auction = Product.objects.create(title="Lelang", price=Decimal('100000'), is_auction=True)
+        self.assertEqual(self._add(auction).status_code, 400)
+
+
+class IdempotentPlaceOrderTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', password='test123')
+        self.client.force_login(self.buyer)
+        self.product = Product.objects.create(title="Sepatu Retry", price=Decimal('100000'), stock=5)
+        self.url = reverse('checkout:place_order')
+
+    def _post(self, key, quantity=1):
+        return self.client.post(
+            self.url, {'product_id': self.product.pk, 'quantity': quantity, 'address': 'Jl. Test'},
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_original_response(self):
+        first = self._post('retry-1')
+        second = self._post('retry-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 4)
+
+    def test_new_key_places_new_order(self):
+        self._post('retry-1')
+        self._post('retry-2')
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_same_key_with_different_body_is_rejected(self):
+        self._post('retry-1')
+        self.assertEqual(self._post('retry-1', quantity=2).status_code, 422)
+
+    def test_expired_key_runs_again(self):
+        self._post('retry-1')
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        self._post('retry-1')
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_key_left_in_progress_is_reclaimed_after_the_lease(self):
+        # the first attempt died before storing its response (nothing was committed)
+        self.assertEqual(self._post('retry-1').status_code, 200)
+        Order.objects.all().delete()
+        IdempotencyKey.objects.update(status_code=None, response_body='')
+        self.assertEqual(self._post('retry-1').status_code, 409)
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        response = self._post('retry-1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 200)
+
+    def test_order_and_stored_response_commit_together(self):
+        with mock.patch.object(IdempotencyKey, 'save', side_effect=DatabaseError("disk full")):
+            with self.assertRaises(DatabaseError):
+                self._post('retry-1')
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+
+
+class ConcurrentIdempotentCheckoutTests(TransactionTestCase):
+
+    def test_keyed_cart_checkouts_never_oversell(self):
+        product = Product.objects.create(title="Drop Terbatas", price=Decimal('100000'), stock=10)
+        url = reverse('checkout:cart_checkout_api')
+        body = json.dumps({'items': [{'product_id': str(product.pk), 'quantity': 1}], 'address': 'Jl. Test'})
+        clients = []
+        for index in range(24):
+            client = Client()
+            client.force_login(User.objects.create(username=f'buyer{index}'))
+            clients.append(client)
+
+        def buy(index):
+            try:
+                return clients[index].post(url, body, content_type='application/json',
+                                           HTTP_IDEMPOTENCY_KEY=f'cart-{index}').status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            codes = list(pool.map(buy, range(24)))
+
+        self.assertTrue(set(codes) <= {200, 400}, codes)
+        self.assertEqual(codes.count(200), 10)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(Order.objects.count(), 10)
+        self.assertEqual(IdempotencyKey.objects.filter(status_code=200).count(), 10)
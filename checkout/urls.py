@@ -1,5 +1,6 @@
 from django.urls import path
-from .views import place_order, order_list_api, checkout_view, checkout_success, order_list
+from .views import place_order, order_list_api, checkout_view, checkout_success, order_list, \
+    cart_api, cart_add_api, cart_update_api, cart_checkout_api
 
 app_name = "checkout"
 
@@ -12,4 +13,8 @@ urlpatterns = [
     # API
     path("api/place-order/", place_order, name="place_order"),
     path("api/orders/", order_list_api, name="order_list_api"),
+    path("api/cart/", cart_api, name="cart_api"),
+    path("api/cart/add/", cart_add_api, name="cart_add_api"),
+    path("api/cart/update/", cart_update_api, name="cart_update_api"),
+    path("api/cart/checkout/", cart_checkout_api, name="cart_checkout_api"),
 ]
@@ -1,12 +1,17 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
+from django.core.exceptions import ValidationError
 from decimal import Decimal
+from uuid import UUID
 import json
 
 from main.models import Product
+from main.idempotency import idempotent
 from .models import Order, OrderItem
+from .cart import Cart, MAX_CART_LINES
+from .services import place_order as place_order_for, place_cart_order, serialize_orders, WEB_SHIPPING_FEES, API_SHIPPING_FEES
 
 
 # ======================================================
@@ -17,64 +22,46 @@ from .models import Order, OrderItem
 def checkout_view(request):
     if request.method == "POST" and request.headers.get("x-requested-with") == "XMLHttpRequest":
         product_id = request.POST.get("product_id")
-        quantity = int(request.POST.get("quantity", 1))
-        address = request.POST.get("address", "Alamat default")
-        payment_method = request.POST.get("payment_method", "EWALLET")
-        shipping_type = request.POST.get("shipping_type", "BIASA")
-        insurance = request.POST.get("insurance") == "on"
-        note = request.POST.get("note", "")
+        try:
+            quantity = int(request.POST.get("quantity", 1))
+        except ValueError:
+            return JsonResponse({"status": "error", "message": "Jumlah tidak valid."}, status=400)
+
+        result = place_order_for(
+            request.user,
+            product_id,
+            quantity,
+            address=request.POST.get("address", "Alamat default"),
+            payment_method=request.POST.get("payment_method", "EWALLET"),
+            shipping_type=request.POST.get("shipping_type", "BIASA"),
+            insurance=request.POST.get("insurance") == "on",
+            note=request.POST.get("note", ""),
+            shipping_fees=WEB_SHIPPING_FEES,
+        )
 
-        product = get_object_or_404(Product, id=product_id)
+        if result.status == "not_found":
+            raise Http404("Product not found")
 
         # Prevent direct purchase of auction products
-        if product.is_auction:
+        if result.status == "auction":
             return JsonResponse(
                 {"status": "error", "message": "Produk auction tidak dapat dibeli langsung. Silakan ikuti proses lelang."},
                 status=400
             )
 
-        if product.stock < quantity:
+        if result.status == "out_of_stock":
             return JsonResponse(
                 {"status": "error", "message": "Stok tidak mencukupi."},
                 status=400
             )
 
-        total_price = Decimal(product.price) * quantity
-
-        if shipping_type == "CEPAT":
-            total_price += Decimal("10000")
-        elif shipping_type in ["SAMEDAY", "SAME_DAY"]:
-            total_price += Decimal("20000")
-
-        if insurance:
-            total_price += Decimal("5000")
-
-        order = Order.objects.create(
-            user=request.user,
-            total_price=total_price,
-            address=address,
-            payment_method=payment_method,
-            shipping_type=shipping_type,
-            insurance=insurance,
-            note=note,
-            status="PAID",
-        )
-
-        OrderItem.objects.create(
-            order=order,
-            product=product,
-            quantity=quantity,
-            price=product.price,
-        )
-
-        product.stock -= quantity
-        product.count_sold += quantity
-        product.save()
+        if not result.ok:
+            return JsonResponse({"status": "error", "message": result.message}, status=400)
 
         return JsonResponse({
             "status": "success",
-            "order_id": str(order.id),
-            "total": str(order.total_price),
+            "order_id": str(result.order.id),
+            "total": str(result.order.total_price),
         })
 
     product_id = request.GET.get("product_id")
@@ -117,6 +104,7 @@ def order_list(request):
 # PLACE ORDER (FLUTTER API)
 # ===========================
 @csrf_exempt
+@idempotent('place_order', serialize=lambda request: serialize_orders())
 def place_order(request):
     # if not request.user.is_authenticated:
     #     return JsonResponse(
@@ -138,67 +126,206 @@ def place_order(request):
             status=400
         )
     product_id = data.get("product_id")
-    quantity = int(data.get("quantity", 1))
-    address = data.get("address", "")
-    payment_method = data.get("payment_method", "EWALLET")
-    shipping_type = data.get("shipping_type", "REGULER")
+    try:
+        quantity = int(data.get("quantity", 1))
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Invalid quantity"}, status=400)
     insurance = data.get("insurance", False)
-    note = data.get("note", "")
 
     if isinstance(insurance, str):
         insurance = insurance.lower() == "true"
 
-    product = Product.objects.get(id=product_id)
+    result = place_order_for(
+        request.user,
+        product_id,
+        quantity,
+        address=data.get("address", ""),
+        payment_method=data.get("payment_method", "EWALLET"),
+        shipping_type=data.get("shipping_type", "REGULER"),
+        insurance=insurance,
+        note=data.get("note", ""),
+        shipping_fees=API_SHIPPING_FEES,
+    )
+
+    if result.status == "not_found":
+        return JsonResponse({"status": "error", "message": "Product not found"}, status=404)
 
     # Prevent direct purchase of auction products
-    if product.is_auction:
+    if result.status == "auction":
         return JsonResponse(
             {"status": "error", "message": "Auction products cannot be purchased directly. Please participate in the auction."},
             status=400
         )
 
-    if product.stock < quantity:
+    if result.status == "out_of_stock":
         return JsonResponse(
             {"status": "error", "message": "Stok tidak cukup"},
             status=400
         )
 
-    total_price = Decimal(product.price) * quantity
+    if not result.ok:
+        return JsonResponse({"status": "error", "message": result.message}, status=400)
+
+    return JsonResponse({
+        "status": "success",
+        "order_id": str(result.order.id),
+        "total_price": str(result.order.total_price),
+    })
+
+
+# ===========================
+# CART (WEB + FLUTTER API)
+# ===========================
+def _cart_payload(cart):
+    """Isi keranjang beserta data produk, diambil dengan satu query."""
+    lines = cart.lines()
+    products = Product.objects.in_bulk([product_id for product_id, _ in lines])
+    items = []
+    subtotal = Decimal("0")
+    for product_id, quantity in lines:
+        product = products.get(UUID(product_id))
+        if product is None:
+            continue
+        line_total = Decimal(product.price) * quantity
+        subtotal += line_total
+        items.append({
+            "product_id": product_id,
+            "title": product.title,
+            "price": str(product.price),
+            "quantity": quantity,
+            "stock": product.stock,
+            "line_total": str(line_total),
+        })
+    return {"status": "success", "items": items, "subtotal": str(subtotal)}
+
+
+def _parse_quantity(raw, default=1):
+    try:
+        return int(raw if raw not in (None, "") else default)
+    except (TypeError, ValueError):
+        return None
+
+
+@csrf_exempt
+def cart_api(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({"status": "error", "message": "Unauthorized"}, status=401)
+    return JsonResponse(_cart_payload(Cart(request.session)))
+
+
+@csrf_exempt
+def cart_add_api(request):
+    """POST product_id, quantity (default 1). quantity ditambahkan ke isi keranjang."""
+    if not request.user.is_authenticated:
+        return JsonResponse({"status": "error", "message": "Unauthorized"}, status=401)
+    if request.method != "POST":
+        return JsonResponse({"status": "error", "message": "POST only"}, status=405)
+
+    quantity = _parse_quantity(request.POST.get("quantity"))
+    if quantity is None or quantity < 1:
+        return JsonResponse({"status": "error", "message": "Invalid quantity"}, status=400)
+
+    try:
+        product = Product.objects.filter(pk=request.POST.get("product_id")).only("id", "is_auction").first()
+    except (ValueError, ValidationError):
+        product = None
+    if product is None:
+        return JsonResponse({"status": "error", "message": "Product not found"}, status=404)
+    if product.is_auction:
+        return JsonResponse(
+            {"status": "error", "message": "Auction products cannot be purchased directly. Please participate in the auction."},
+            status=400
+        )
+
+    cart = Cart(request.session)
+    if product.pk not in cart and len(cart) >= MAX_CART_LINES:
+        return JsonResponse({"status": "error", "message": "Cart is full"}, status=400)
+    cart.add(product.pk, quantity)
+    return JsonResponse(_cart_payload(cart))
+
+
+@csrf_exempt
+def cart_update_api(request):
+    """POST product_id, quantity. quantity 0 menghapus produk dari keranjang."""
+    if not request.user.is_authenticated:
+        return JsonResponse({"status": "error", "message": "Unauthorized"}, status=401)
+    if request.method != "POST":
+        return JsonResponse({"status": "error", "message": "POST only"}, status=405)
+
+    quantity = _parse_quantity(request.POST.get("quantity"), default=0)
+    if quantity is None or quantity < 0:
+        return JsonResponse({"status": "error", "message": "Invalid quantity"}, status=400)
+
+    cart = Cart(request.session)
+    product_id = request.POST.get("product_id", "")
+    if product_id not in cart:
+        return JsonResponse({"status": "error", "message": "Product is not in the cart"}, status=404)
+    cart.set(product_id, quantity)
+    return JsonResponse(_cart_payload(cart))
 
-    if shipping_type == "NEXTDAY":
-        total_price += Decimal("10000")
-    elif shipping_type == "SAMEDAY":
-        total_price += Decimal("15000")
 
-    if insurance:
-        total_price += Decimal("5000")
+@csrf_exempt
+@idempotent('cart_checkout', serialize=lambda request: serialize_orders())
+def cart_checkout_api(request):
+    """
+    Satu order untuk banyak item.
+    Item diambil dari body JSON {"items": [{"product_id", "quantity"}], ...} bila ada,
+    kalau tidak dari keranjang session (yang dikosongkan setelah order berhasil).
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"status": "error", "message": "Unauthorized"}, status=401)
+    if request.method != "POST":
+        return JsonResponse({"status": "error", "message": "POST only"}, status=405)
+
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body.decode("utf-8") or "{}")
+        except (ValueError, UnicodeDecodeError):
+            return JsonResponse({"status": "error", "message": "Invalid JSON"}, status=400)
+    else:
+        data = request.POST
+
+    cart = Cart(request.session)
+    if data.get("items"):
+        try:
+            lines = [(item["product_id"], int(item.get("quantity", 1))) for item in data["items"]]
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return JsonResponse({"status": "error", "message": "Invalid items"}, status=400)
+        from_cart = False
+    else:
+        lines = cart.lines()
+        from_cart = True
+
+    if len(lines) > MAX_CART_LINES:
+        return JsonResponse({"status": "error", "message": "Too many items"}, status=400)
 
-    order = Order.objects.create(
-        user=request.user,
-        total_price=total_price,
-        address=address,
-        payment_method=payment_method,
-        shipping_type=shipping_type,
+    insurance = data.get("insurance", False)
+    if isinstance(insurance, str):
+        insurance = insurance.lower() in ("true", "on")
+
+    result = place_cart_order(
+        request.user,
+        lines,
+        address=data.get("address", ""),
+        payment_method=data.get("payment_method", "EWALLET"),
+        shipping_type=data.get("shipping_type", "REGULER"),
         insurance=insurance,
-        note=note,
-        status="PAID",
+        note=data.get("note", ""),
+        shipping_fees=API_SHIPPING_FEES,
     )
 
-    OrderItem.objects.create(
-        order=order,
-        product=product,
-        quantity=quantity,
-        price=product.price,
-    )
+    if not result.ok:
+        status = 404 if result.status == "not_found" else 400
+        return JsonResponse({"status": "error", "message": result.message}, status=status)
 
-    product.stock -= quantity
-    product.count_sold += quantity
-    product.save()
+    if from_cart:
+        cart.clear()
 
     return JsonResponse({
         "status": "success",
-        "order_id": str(order.id),
-        "total_price": str(order.total_price),
+        "order_id": str(result.order.id),
+        "total_price": str(result.order.total_price),
+        "item_count": len(lines),
     })
 
 
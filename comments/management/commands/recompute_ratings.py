@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from main.models import Product
+from comments.models import ProductRating, RATING_STARS
+
+
+class Command(BaseCommand):
+    help = 'Rebuild ProductRating (count, total, 1-5 histogram) for every product from its visible comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows written per bulk upsert')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = ['rating_count', 'rating_total'] + [f'stars_{stars}' for stars in RATING_STARS]
+
+        products = (
+            Product.objects
+            .annotate(**ProductRating.counted_aggregates())
+            .values_list('pk', *fields)
+        )
+
+        summaries = [
+            ProductRating(product_id=row[0], **dict(zip(fields, row[1:])))
+            for row in products.iterator()
+        ]
+
+        with transaction.atomic():
+            ProductRating.objects.bulk_create(
+                summaries,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['product'],
+                update_fields=fields + ['updated_at'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Recomputed ratings for {len(summaries)} products."))
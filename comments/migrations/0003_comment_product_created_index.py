@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checkout', '0002_order_user_created_index'),
+        ('comments', '0002_productrating'),
+        ('main', '0013_hot_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['product', '-created_at'], name='comment_product_created_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+
+RATING_STARS = range(1, 6)
+
+
+def backfill_product_ratings(apps, schema_editor):
+    """Isi ProductRating dari comment yang sudah ada (sama seperti manage.py recompute_ratings)."""
+    Product = apps.get_model('main', 'Product')
+    ProductRating = apps.get_model('comments', 'ProductRating')
+
+    counted = Q(comments__is_visible=True, comments__rating__in=RATING_STARS)
+    aggregates = {
+        'rating_count': Count('comments', filter=counted),
+        'rating_total': Sum('comments__rating', filter=counted, default=0),
+    }
+    for stars in RATING_STARS:
+        aggregates[f'stars_{stars}'] = Count('comments', filter=counted & Q(comments__rating=stars))
+
+    fields = list(aggregates)
+    rows = Product.objects.annotate(**aggregates).values_list('pk', *fields)
+    ProductRating.objects.bulk_create(
+        [ProductRating(product_id=pk, **dict(zip(fields, values))) for pk, *values in rows.iterator()],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=fields + ['updated_at'],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0003_comment_product_created_index'),
+    ]
+
+    operations = [
+        # Produk yang sudah punya ulasan sebelum ProductRating ada
+        migrations.RunPython(backfill_product_ratings, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 import uuid
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.forms import ValidationError
 from main.models import Product
@@ -28,6 +31,10 @@ class Comment(models.Model):
         ordering = ['-created_at']
         # optional: mencegah duplikat komentar untuk satu order_item (mis. satu pembeli hanya 1 ulasan per item)
         unique_together = ('order_item',)  # ubah sesuai kebijakan
+        indexes = [
+            # Review threads per product, newest first
+            models.Index(fields=['product', '-created_at'], name='comment_product_created_idx'),
+        ]
 
     def __str__(self):
         prod_title = getattr(self.product, "title", str(self.product))
@@ -42,9 +49,18 @@ class Comment(models.Model):
     #     if order_user != self.author:
     #         raise ValidationError("Hanya pemilik order yang dapat mengomentari order item ini.")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # ingat rating yang tersimpan agar ProductRating cukup menerapkan selisihnya
+        instance._stored_stars = rated_stars(instance)
+        return instance
+
     def save(self, *args, **kwargs):
         self.full_clean()  # jalankan clean() sebelum save
-        super().save(*args, **kwargs)
+        # comment dan ringkasan rating produk disimpan dalam satu transaksi
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
 
 class Reply(models.Model):
@@ -86,4 +102,111 @@ class Reply(models.Model):
         except ValidationError:
             # jika validasi gagal, biarkan propagate error ke caller (view)
             raise
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+RATING_STARS = range(1, 6)
+
+
+def rated_stars(comment):
+    """Bintang (1-5) yang dihitung ke ringkasan produk, atau None bila comment disembunyikan / tanpa rating."""
+    if comment.is_visible and comment.rating in RATING_STARS:
+        return comment.rating
+    return None
+
+
+class ProductRating(models.Model):
+    """
+    Ringkasan rating per produk (jumlah, total bintang, histogram 1-5).
+    Diperbarui setiap Comment dibuat/diubah/disembunyikan/dihapus sehingga listing
+    bisa menampilkan "4.6 (312)" tanpa mengambil semua ulasan.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='rating_summary')
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product.title}: {self.average} ({self.rating_count} ratings)"
+
+    @property
+    def average(self):
+        if not self.rating_count:
+            return None
+        return round(self.rating_total / self.rating_count, 2)
+
+    @property
+    def histogram(self):
+        return {str(stars): getattr(self, f'stars_{stars}') for stars in RATING_STARS}
+
+    def as_dict(self):
+        return {'average': self.average, 'count': self.rating_count, 'histogram': self.histogram}
+
+    @staticmethod
+    def empty_dict():
+        return {'average': None, 'count': 0, 'histogram': {str(stars): 0 for stars in RATING_STARS}}
+
+    @classmethod
+    def apply_change(cls, product_id, old_stars, new_stars, create=True):
+        """
+        Apply one comment's change (old -> new stars, None = not counted) with F() UPDATEs.
+        A missing summary is rebuilt from the comments instead, so it never starts from zero
+        for a product that already had reviews.
+        """
+        if old_stars == new_stars:
+            return
+        with transaction.atomic():
+            if create:
+                _, created = cls.objects.get_or_create(product_id=product_id)
+                if created:
+                    cls.recompute_for(product_id)
+                    return
+
+            changes = {}
+            if old_stars is not None:
+                changes['rating_count'] = F('rating_count') - 1
+                changes['rating_total'] = F('rating_total') - old_stars
+                changes[f'stars_{old_stars}'] = F(f'stars_{old_stars}') - 1
+            if new_stars is not None:
+                changes['rating_count'] = changes.get('rating_count', F('rating_count')) + 1
+                changes['rating_total'] = changes.get('rating_total', F('rating_total')) + new_stars
+                changes[f'stars_{new_stars}'] = F(f'stars_{new_stars}') + 1
+            cls.objects.filter(product_id=product_id).update(**changes)
+
+    @classmethod
+    def counted_aggregates(cls):
+        """Aggregate expressions (relative to Product) used to rebuild summaries from comments."""
+        counted = Q(comments__is_visible=True, comments__rating__in=RATING_STARS)
+        aggregates = {
+            'rating_count': Count('comments', filter=counted),
+            'rating_total': Sum('comments__rating', filter=counted, default=0),
+        }
+        for stars in RATING_STARS:
+            aggregates[f'stars_{stars}'] = Count('comments', filter=counted & Q(comments__rating=stars))
+        return aggregates
+
+    @classmethod
+    def recompute_for(cls, product_id):
+        """Rebuild the summary of one product from its comments."""
+        with transaction.atomic():
+            values = Product.objects.filter(pk=product_id).aggregate(**cls.counted_aggregates())
+            cls.objects.update_or_create(product_id=product_id, defaults=values)
+
+
+@receiver(post_save, sender=Comment)
+def update_product_rating_on_save(sender, instance, created, **kwargs):
+    new_stars = rated_stars(instance)
+    old_stars = None if created else getattr(instance, '_stored_stars', None)
+    ProductRating.apply_change(instance.product_id, old_stars, new_stars)
+    instance._stored_stars = new_stars
+
+
+@receiver(post_delete, sender=Comment)
+def update_product_rating_on_delete(sender, instance, **kwargs):
+    # create=False: saat produk ikut dihapus (cascade) ringkasannya juga hilang
+    ProductRating.apply_change(instance.product_id, rated_stars(instance), None, create=False)
@@ -0,0 +1,23 @@
+import uuid
+
+from django.contrib.auth.models import User
+
+from checkout.models import Order, OrderItem
+from comments.models import Comment, Reply
+
+
+def create_review(product, rating=5, buyer=None, content="Ulasan", reply_author=None, reply="Terima kasih"):
+    """
+    Test fixture: a PAID order of product by buyer (a fresh user if None) and its review,
+    plus a reply when reply_author is given. Returns the Comment.
+    """
+    if buyer is None:
+        buyer = User.objects.create_user(username=f'buyer{uuid.uuid4().hex[:8]}', password='12345')
+    order = Order.objects.create(user=buyer, address="Jl. Test", status='PAID')
+    order_item = OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+    comment = Comment.objects.create(
+        author=buyer, product=product, order_item=order_item, content=content, rating=rating
+    )
+    if reply_author is not None:
+        Reply.objects.create(comment=comment, author=reply_author, content=reply)
+    return comment
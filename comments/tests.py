@@ -1,14 +1,19 @@
 # comments/tests.py
 from decimal import Decimal
+import importlib
+import io
 import uuid
 
+from django.apps import apps
+from django.core.management import call_command
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User
 
 from main.models import Product, Profile
 from checkout.models import Order, OrderItem
-from comments.models import Comment, Reply
+from comments.models import Comment, ProductRating, Reply
+from comments.testing import create_review
 
 
 class CommentsClientTests(TestCase):
@@ -201,4 +206,80 @@ class CommentsClientTests(TestCase):
         self.client.login(username='seller', password='pwd')
         resp2 = self.client.post(url_delete)
         self.assertEqual(resp2.status_code, 302)
-        self.assertFalse(Reply.objects.filter(pk=r.id).exists())
\ No newline at end of file
+        self.assertFalse(Reply.objects.filter(pk=r.id).exists())
+
+class ProductRatingTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', password='pwd')
+        self.product = Product.objects.create(
+            user=self.seller, title='Sepatu Rating', price=Decimal('100000'), category="Men's Shoes", stock=10,
+        )
+
+    def _review(self, rating):
+        return create_review(self.product, rating)
+
+    def _summary(self):
+        return ProductRating.objects.get(product=self.product)
+
+    def test_create_edit_hide_delete_keep_summary_in_sync(self):
+        first = self._review(5)
+        self._review(3)
+        summary = self._summary()
+        self.assertEqual((summary.rating_count, summary.rating_total, summary.average), (2, 8, 4.0))
+        self.assertEqual(summary.histogram, {'1': 0, '2': 0, '3': 1, '4': 0, '5': 1})
+
+        first = Comment.objects.get(pk=first.pk)
+        first.rating = 4
+        first.save()
+        self.assertEqual(self._summary().histogram, {'1': 0, '2': 0, '3': 1, '4': 1, '5': 0})
+
+        first.is_visible = False
+        first.save()
+        summary = self._summary()
+        self.assertEqual((summary.rating_count, summary.rating_total), (1, 3))
+
+        first.is_visible = True
+        first.save()
+        Comment.objects.get(pk=first.pk).delete()
+        summary = self._summary()
+        self.assertEqual((summary.rating_count, summary.rating_total), (1, 3))
+        self.assertEqual(summary.histogram['4'], 0)
+
+    def test_missing_summary_is_rebuilt_not_started_from_zero(self):
+        self._review(2)
+        ProductRating.objects.all().delete()
+
+        self._review(4)
+        summary = self._summary()
+        self.assertEqual((summary.rating_count, summary.rating_total), (2, 6))
+
+    def test_recompute_command_repairs_drift(self):
+        self._review(5)
+        self._review(1)
+        ProductRating.objects.filter(product=self.product).update(rating_count=99, stars_5=0)
+
+        call_command('recompute_ratings', stdout=io.StringIO())
+        summary = self._summary()
+        self.assertEqual((summary.rating_count, summary.rating_total), (2, 6))
+        self.assertEqual(summary.histogram, {'1': 1, '2': 0, '3': 0, '4': 0, '5': 1})
+
+    def test_rating_is_exposed_in_product_json(self):
+        self._review(5)
+        self._review(4)
+
+        data = Client().get(reverse('main:show_json_feed'), {'comments': 0}).json()
+        rating = data['products'][0]['fields']['rating']
+        self.assertEqual(rating['count'], 2)
+        self.assertEqual(rating['average'], 4.5)
+        self.assertEqual(rating['histogram']['5'], 1)
+
+    def test_migration_backfills_existing_reviews(self):
+        self._review(4)
+        self._review(2)
+        ProductRating.objects.all().delete()
+
+        migration = importlib.import_module('comments.migrations.0004_backfill_product_ratings')
+        migration.backfill_product_ratings(apps, None)
+        summary = self._summary()
+        self.assertEqual((summary.rating_count, summary.rating_total), (2, 6))
+        self.assertEqual(summary.histogram, {'1': 0, '2': 1, '3': 0, '4': 1, '5': 0})
@@ -0,0 +1,203 @@
+import base64
+import binascii
+import json
+import uuid
+
+from django.core import serializers
+from django.core.paginator import Paginator
+from django.db.models import Prefetch, Q
+
+from main.images import RENDITION_FORMATS, image_url, srcset
+from main.models import Product
+from comments.models import Comment, ProductRating, Reply
+
+
+FEED_DEFAULT_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 100
+
+# Rows pulled from the database per round-trip when streaming exports
+EXPORT_CHUNK_SIZE = 500
+
+REVIEW_PAGE_SIZE = 20
+
+# Stable feed order: best sellers first, id as tie-breaker
+FEED_ORDERING = ('-count_sold', '-id')
+
+
+def catalog_queryset(include_comments=True):
+    """
+    Non-auction products with their rating summary and the whole review tree preloaded.
+    Comments, replies, their authors and author profiles are fetched with a fixed
+    number of queries, no matter how many products or comments there are.
+    """
+    products = Product.objects.filter(is_auction=False).select_related('rating_summary')
+    if not include_comments:
+        return products
+
+    return products.prefetch_related(Prefetch('comments', queryset=review_queryset()))
+
+
+def review_queryset():
+    """Comments with their authors, profiles and replies (plus reply authors) preloaded."""
+    replies = Reply.objects.select_related('author__profile')
+    return (
+        Comment.objects
+        .select_related('author__profile')
+        .prefetch_related(Prefetch('replies', queryset=replies))
+    )
+
+
+def review_page(product, page_number, page_size=REVIEW_PAGE_SIZE):
+    """
+    One page of a product's review threads for the detail page.
+    Costs a COUNT, the comment page and one query for all replies on it,
+    however many reviews the product has.
+    """
+    paginator = Paginator(review_queryset().filter(product=product), page_size)
+    return paginator.get_page(page_number)
+
+
+def _author_role(author):
+    if author and hasattr(author, 'profile'):
+        return author.profile.role
+    return None
+
+
+def serialize_reply(reply):
+    return {
+        'reply_id': str(reply.id),
+        'reply_content': reply.content,
+        'reply_author_id': str(reply.author_id) if reply.author_id else None,
+        'reply_author_username': reply.author.username if reply.author else None,
+        'reply_author_role': _author_role(reply.author),
+        'reply_created_at': reply.created_at.isoformat(),
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'comment_id': str(comment.id),
+        'comment_rating': comment.rating,
+        'comment_content': comment.content,
+        'comment_author_id': str(comment.author_id) if comment.author_id else None,
+        'comment_author_username': comment.author.username if comment.author else None,
+        'comment_author_role': _author_role(comment.author),
+        'comment_created_at': comment.created_at.isoformat(),
+        'comment_order_item_id': str(comment.order_item_id) if comment.order_item_id else None,
+        'replies': [serialize_reply(reply) for reply in comment.replies.all()],
+    }
+
+
+def _rating_for(product):
+    summary = getattr(product, 'rating_summary', None)
+    return summary.as_dict() if summary is not None else ProductRating.empty_dict()
+
+
+def serialize_product(product, include_comments=True):
+    """Serialize one product into the shape used by /json/ (Flutter home feed)."""
+    # Get thumbnail value - if it's an ImageField, get the name
+    thumbnail_value = product.thumbnail.name if product.thumbnail else ''
+
+    fields = {
+        'title': product.title,
+        'price': int(product.price),
+        'category': product.category,
+        'thumbnail': thumbnail_value,
+        'thumbnail_url': image_url(thumbnail_value) if thumbnail_value else '',
+        'srcset': {fmt: srcset(product.image_renditions, fmt) for fmt in RENDITION_FORMATS}
+        if product.image_renditions else {},
+        'count_sold': product.count_sold,
+        'stock': product.stock,
+        'is_auction': product.is_auction,
+        'auction_increment': int(product.auction_increment) if product.auction_increment else None,
+        'auction_end_time': product.auction_end_time.isoformat() if product.auction_end_time else None,
+        'user': product.user_id,
+        'rating': _rating_for(product),
+    }
+    if include_comments:
+        fields['comments'] = [serialize_comment(comment) for comment in product.comments.all()]
+
+    return {
+        'model': 'main.product',
+        'pk': str(product.id),
+        'fields': fields,
+    }
+
+
+def encode_feed_cursor(product):
+    raw = f"{product.count_sold}:{product.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_feed_cursor(cursor):
+    """Return (count_sold, id) from a cursor, or raise ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        count_sold, product_id = raw.split(':', 1)
+        return int(count_sold), uuid.UUID(product_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def feed_page(cursor=None, page_size=FEED_DEFAULT_PAGE_SIZE, include_comments=True):
+    """
+    One page of the product feed using keyset pagination.
+    Only page_size + 1 rows are read, so the cost per page stays the same however
+    deep the client scrolls. Returns (products, next_cursor).
+    """
+    products = catalog_queryset(include_comments=include_comments).order_by(*FEED_ORDERING)
+
+    if cursor:
+        count_sold, product_id = decode_feed_cursor(cursor)
+        products = products.filter(
+            Q(count_sold__lt=count_sold) | Q(count_sold=count_sold, id__lt=product_id)
+        )
+
+    page = list(products[:page_size + 1])
+    has_more = len(page) > page_size
+    page = page[:page_size]
+    next_cursor = encode_feed_cursor(page[-1]) if has_more else None
+    return page, next_cursor
+
+
+def stream_catalog_json(chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the /json/ payload piece by piece instead of building one big list."""
+    yield '['
+    for index, product in enumerate(catalog_queryset().iterator(chunk_size=chunk_size)):
+        if index:
+            yield ','
+        yield json.dumps(serialize_product(product))
+    yield ']'
+
+
+def stream_catalog_ndjson(chunk_size=EXPORT_CHUNK_SIZE):
+    """Same records as /json/, one JSON document per line (partner feed)."""
+    for product in catalog_queryset().iterator(chunk_size=chunk_size):
+        yield json.dumps(serialize_product(product)) + '\n'
+
+
+def stream_catalog_xml(chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the /xml/ payload in batches of chunk_size products.
+    Each batch goes through Django's XML serializer and only the <object> elements
+    are kept, so the output matches serializers.serialize("xml", ...) as a whole.
+    """
+    closing_tag = '</django-objects>'
+    header = serializers.serialize('xml', []).rsplit(closing_tag, 1)[0]
+    yield header
+
+    batch = []
+    for product in Product.objects.filter(is_auction=False).iterator(chunk_size=chunk_size):
+        batch.append(product)
+        if len(batch) >= chunk_size:
+            yield _xml_objects(batch, header, closing_tag)
+            batch = []
+    if batch:
+        yield _xml_objects(batch, header, closing_tag)
+
+    yield closing_tag
+
+
+def _xml_objects(batch, header, closing_tag):
+    xml_data = serializers.serialize('xml', batch)
+    return xml_data[len(header):].rsplit(closing_tag, 1)[0]
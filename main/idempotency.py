@@ -0,0 +1,135 @@
+import hashlib
+from contextlib import nullcontext
+from datetime import timedelta
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_TTL = timedelta(hours=24)
+# A key still 'in progress' after this long belongs to a request that died; a retry may take it over
+PROCESSING_LEASE = timedelta(seconds=60)
+MAX_KEY_LENGTH = 255
+
+
+def _owner(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    return 'anonymous'
+
+
+def _fingerprint(request):
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.get_full_path().encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _replay(record):
+    response = HttpResponse(record.response_body, status=record.status_code, content_type='application/json')
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _reclaim(lookup, fingerprint, now, ttl):
+    """Take over a key whose first request never finished (crash / killed worker)."""
+    with transaction.atomic():
+        record = (
+            IdempotencyKey.objects.select_for_update()
+            .filter(status_code__isnull=True, created_at__lte=now - PROCESSING_LEASE, **lookup)
+            .first()
+        )
+        if record is None:
+            return None
+        record.request_hash = fingerprint
+        record.created_at = now
+        record.expires_at = now + ttl
+        record.save(update_fields=['request_hash', 'created_at', 'expires_at'])
+        return record
+
+
+def _run_keyed(view_func, request, args, kwargs, scope, key, ttl):
+    owner = _owner(request)
+    fingerprint = _fingerprint(request)
+    now = timezone.now()
+    lookup = {'scope': scope, 'owner': owner, 'key': key}
+
+    IdempotencyKey.objects.filter(expires_at__lte=now, **lookup).delete()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                request_hash=fingerprint, expires_at=now + ttl, **lookup
+            )
+    except IntegrityError:
+        record = _reclaim(lookup, fingerprint, now, ttl)
+        if record is None:
+            existing = IdempotencyKey.objects.filter(**lookup).first()
+            if existing is None:
+                # the other request failed and released the key in the meantime
+                return view_func(request, *args, **kwargs)
+            if existing.request_hash != fingerprint:
+                return JsonResponse(
+                    {'status': 'error', 'message': 'Idempotency-Key was already used for a different request'},
+                    status=422,
+                )
+            if existing.status_code is None:
+                return JsonResponse(
+                    {'status': 'error', 'message': 'A request with this Idempotency-Key is still being processed'},
+                    status=409,
+                )
+            return _replay(existing)
+
+    try:
+        with transaction.atomic():
+            response = view_func(request, *args, **kwargs)
+            if response.status_code >= 500 or getattr(response, 'streaming', False):
+                # let the client retry for real
+                transaction.set_rollback(True)
+            else:
+                record.status_code = response.status_code
+                record.response_body = response.content.decode(response.charset)
+                record.save(update_fields=['status_code', 'response_body'])
+                return response
+    except Exception:
+        record.delete()
+        raise
+
+    record.delete()
+    return response
+
+
+def idempotent(scope, ttl=IDEMPOTENCY_TTL, serialize=None):
+    """
+    Make a JSON POST endpoint safe to retry.
+    When the client sends an Idempotency-Key header, the first response for that key is
+    stored (for ttl) and returned again for retries of the same request without running
+    the view. The same key with a different body gets 422; a retry that arrives while the
+    first request is still running gets 409. 5xx responses are not stored.
+    The view and the stored response commit in one transaction, so an order/bid never
+    exists without its response; a key left 'in progress' by a dead request can be
+    reclaimed after PROCESSING_LEASE.
+    serialize(request, *args, **kwargs) returns the service's serialization lock (e.g.
+    checkout.services.serialize_orders). It is held around the key bookkeeping and until
+    the view's transaction has committed, otherwise the next request could read the
+    stock/highest bid before that commit.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key or request.method != 'POST':
+                return view_func(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return JsonResponse({'status': 'error', 'message': 'Idempotency-Key is too long'}, status=400)
+
+            with serialize(request, *args, **kwargs) if serialize else nullcontext():
+                return _run_keyed(view_func, request, args, kwargs, scope, key, ttl)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from main.images import image_root, is_stored_image
+from main.storage import product_image_storage
+
+CONTENT_TYPES = {
+    '.avif': 'image/avif',
+    '.webp': 'image/webp',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.svg': 'image/svg+xml',
+}
+
+REMOTE_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+REMOTE_MAX_BYTES = 10 * 1024 * 1024
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_TTL = 24 * 60 * 60  # after this the origin is asked again (conditionally)
+NEGATIVE_CACHE_SECONDS = 60  # origin down: serve the stale copy this long before asking again
+
+
+class RemoteImageError(Exception):
+    """The remote image could not be fetched (bad URL, upstream error, not an image, too big)."""
+
+
+def local_image(relative_path):
+    """(path, content type, stat) for a seeded static image or an uploaded one in the product image storage, or None."""
+    storage = product_image_storage()
+    root = storage.location if is_stored_image(relative_path) and hasattr(storage, 'location') else image_root()
+    try:
+        path = safe_join(root, relative_path)
+    except SuspiciousFileOperation:
+        return None
+    if not os.path.isfile(path):
+        return None
+    content_type = CONTENT_TYPES.get(os.path.splitext(path)[1].lower(), 'application/octet-stream')
+    return path, content_type, os.stat(path)
+
+
+def file_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _session():
+    # satu Session per proses: koneksi keep-alive dipakai ulang untuk semua gambar remote
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=8, pool_maxsize=32,
+        max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504), allowed_methods=('GET',)),
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = 'naik-image-proxy/1.0'
+    return session
+
+
+http_session = _session()
+
+
+@dataclass
+class CachedImage:
+    path: str
+    content_type: str
+    etag: str
+    last_modified: float
+
+
+class RemoteImageCache:
+    """
+    Bounded on-disk LRU cache for remote images, keyed by sha256(url).
+    Each entry is <key> (the body) plus <key>.json (content type, validators); the
+    metadata file's mtime is bumped on every hit and the least recently used entries
+    are evicted once the folder grows past max_bytes.
+    """
+
+    def __init__(self, directory=None, max_bytes=None, ttl=CACHE_TTL):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._size = None  # running total of cached bytes, measured on the first eviction check
+
+    @property
+    def directory(self):
+        return str(self._directory or getattr(
+            settings, 'IMAGE_PROXY_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'proxy-cache')
+        ))
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes or getattr(settings, 'IMAGE_PROXY_CACHE_MAX_BYTES', CACHE_MAX_BYTES)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        folder = os.path.join(self.directory, key[:2])
+        return os.path.join(folder, key), os.path.join(folder, key + '.json')
+
+    def _read_meta(self, meta_path):
+        try:
+            with open(meta_path, encoding='utf-8') as meta:
+                return json.load(meta)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, url):
+        """The cached image for url, fetching or revalidating it upstream when needed."""
+        if not url.startswith(('http://', 'https://')):
+            raise RemoteImageError('Only http(s) URLs can be proxied')
+
+        body_path, meta_path = self._paths(url)
+        meta = self._read_meta(meta_path)
+        if meta is not None and os.path.exists(body_path):
+            if time.time() - meta['fetched_at'] < self.ttl or self._revalidated(url, meta, meta_path):
+                try:
+                    os.utime(meta_path)  # LRU: mark as recently used
+                    return self._entry(body_path, meta)
+                except FileNotFoundError:
+                    pass  # evicted in the meantime
+        return self._fetch(url, body_path, meta_path)
+
+    def _entry(self, body_path, meta):
+        return CachedImage(body_path, meta['content_type'], meta['etag'], meta['fetched_at'])
+
+    def _revalidated(self, url, meta, meta_path):
+        headers = {}
+        if meta.get('upstream_etag'):
+            headers['If-None-Match'] = meta['upstream_etag']
+        if meta.get('upstream_last_modified'):
+            headers['If-Modified-Since'] = meta['upstream_last_modified']
+        if not headers:
+            return False
+        try:
+            response = http_session.get(url, headers=headers, timeout=REMOTE_TIMEOUT, stream=True)
+            response.close()
+        except requests.RequestException:
+            # origin down: a stale copy beats an error, and the next NEGATIVE_CACHE_SECONDS
+            # of requests must not each wait for the timeout again
+            meta['fetched_at'] = time.time() - self.ttl + NEGATIVE_CACHE_SECONDS
+            self._write_json(meta_path, meta)
+            return True
+        if response.status_code != 304:
+            return False
+        meta['fetched_at'] = time.time()
+        self._write_json(meta_path, meta)
+        return True
+
+    def _fetch(self, url, body_path, meta_path):
+        try:
+            response = http_session.get(url, timeout=REMOTE_TIMEOUT, stream=True)
+            response.raise_for_status()
+        except requests.RequestException as exc:
+            raise RemoteImageError(str(exc)) from exc
+
+        with response:
+            content_type = response.headers.get('Content-Type', 'image/jpeg').split(';')[0].strip()
+            if not content_type.startswith('image/'):
+                raise RemoteImageError(f'Not an image: {content_type}')
+            declared = int(response.headers.get('Content-Length') or 0)
+            if declared > REMOTE_MAX_BYTES:
+                raise RemoteImageError('Image too large')
+
+            os.makedirs(os.path.dirname(body_path), exist_ok=True)
+            digest = hashlib.sha256()
+            size = 0
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(body_path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as tmp:
+                    for chunk in response.iter_content(64 * 1024):
+                        size += len(chunk)
+                        if size > REMOTE_MAX_BYTES:
+                            raise RemoteImageError('Image too large')
+                        digest.update(chunk)
+                        tmp.write(chunk)
+                os.replace(tmp_path, body_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+        meta = {
+            'url': url,
+            'content_type': content_type,
+            'etag': f'"{digest.hexdigest()[:32]}"',
+            'fetched_at': time.time(),
+            'size': size,
+            'upstream_etag': response.headers.get('ETag'),
+            'upstream_last_modified': response.headers.get('Last-Modified'),
+        }
+        self._write_json(meta_path, meta)
+        self._added(size)
+        return self._entry(body_path, meta)
+
+    def _write_json(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+            json.dump(data, tmp)
+        os.replace(tmp_path, path)
+
+    def _added(self, size):
+        with self._lock:
+            if self._size is not None:
+                self._size += size
+            if self._size is None or self._size > self.max_bytes:
+                self._size = self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits; returns the new total."""
+        entries = []
+        total = 0
+        for folder, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                meta_path = os.path.join(folder, name)
+                body_path = meta_path[:-len('.json')]
+                try:
+                    size = os.path.getsize(body_path)
+                    used = os.path.getmtime(meta_path)
+                except OSError:
+                    continue
+                total += size
+                entries.append((used, size, body_path, meta_path))
+
+        if total <= self.max_bytes:
+            return total
+        entries.sort()
+        # evict down to 90% so the next few misses don't trigger another walk
+        target = self.max_bytes * 0.9
+        for _, size, body_path, meta_path in entries:
+            if total <= target:
+                break
+            for path in (meta_path, body_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+        return total
+
+
+remote_cache = RemoteImageCache()
+
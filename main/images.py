@@ -0,0 +1,205 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.templatetags.static import static
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from main.storage import PRODUCT_IMAGE_DIR, product_image_storage
+
+logger = logging.getLogger(__name__)
+
+# Lebar rendition (px) yang dipakai card, detail, dan aplikasi Flutter
+RENDITION_WIDTHS = (160, 320, 640, 1280)
+
+# format -> (Pillow format, MIME type, save options); urutan = urutan <source> di <picture>
+RENDITION_FORMATS = {
+    'avif': ('AVIF', 'image/avif', {'quality': 50}),
+    'webp': ('WEBP', 'image/webp', {'quality': 75, 'method': 4}),
+    'png': ('PNG', 'image/png', {'optimize': True}),
+}
+FALLBACK_FORMAT = 'png'
+
+# Relative to the product image storage (MEDIA_ROOT by default), next to uploaded images
+RENDITIONS_DIR = 'image/renditions'
+CARD_SIZES = '(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw'
+
+# Names written by the content-hashed storage: image/products/<h[:2]>/<sha256>.<ext>
+_STORED_NAME_RE = re.compile(rf'^{re.escape(PRODUCT_IMAGE_DIR)}/[0-9a-f]{{2}}/[0-9a-f]{{64}}\.\w+$')
+
+
+def image_root():
+    """Folder the seeded product images (image/products/N.avif) are relative to."""
+    return str(getattr(settings, 'PRODUCT_IMAGE_ROOT', os.path.join(settings.BASE_DIR, 'static')))
+
+
+def is_stored_image(name):
+    """True for thumbnails/renditions living in the product image storage, False for seeded static files."""
+    return bool(name) and (_STORED_NAME_RE.match(name) is not None or name.startswith(RENDITIONS_DIR + '/'))
+
+
+def image_url(name):
+    """Public URL of a thumbnail name, from the storage that holds it."""
+    if is_stored_image(name):
+        return product_image_storage().url(name)
+    return static(name)
+
+
+def content_key(source):
+    """Content address of a source image (file object): the first 24 hex chars of its sha256."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: source.read(1024 * 1024), b''):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()[:24]
+
+
+def rendition_name(key, width, fmt):
+    return f"{RENDITIONS_DIR}/{key[:2]}/{key}/{width}.{fmt}"
+
+
+def _target_widths(source_width, widths):
+    # never upscale; a source narrower than every width gets one rendition at its own size
+    fitting = [width for width in widths if width <= source_width]
+    return fitting or [source_width]
+
+
+def save_atomic(image, path, pil_format, **options):
+    """Encode image to path via a temp file + rename, so readers never see half a file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            image.save(tmp, pil_format, **options)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates 0600, static files must stay world-readable
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def generate_renditions(source, widths=RENDITION_WIDTHS, formats=tuple(RENDITION_FORMATS)):
+    """
+    Write resized copies of source (a path or binary file object) for every
+    (width, format) into the product image storage and return
+    {'key': ..., 'widths': [...]} for Product.image_renditions.
+    Names are derived from the source content, so the same picture is encoded once
+    no matter how many products use it and existing renditions are skipped.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as opened:
+            return generate_renditions(opened, widths, formats)
+
+    storage = product_image_storage()
+    key = content_key(source)
+
+    with Image.open(source) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        target_widths = _target_widths(image.width, widths)
+
+        for width in target_widths:
+            resized = None
+            for fmt in formats:
+                name = rendition_name(key, width, fmt)
+                if storage.exists(name):
+                    continue
+                if resized is None:
+                    height = max(1, round(image.height * width / image.width))
+                    resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                pil_format, _, options = RENDITION_FORMATS[fmt]
+                encoded = io.BytesIO()
+                resized.save(encoded, pil_format, **options)
+                storage.save(name, ContentFile(encoded.getvalue()))
+
+    return {'key': key, 'widths': target_widths}
+
+
+def open_image(name):
+    """Open a thumbnail for reading from the storage or the seeded static folder; None if missing/remote."""
+    if not name or '://' in name:
+        return None
+    storage = product_image_storage()
+    if is_stored_image(name):
+        return storage.open(name, 'rb') if storage.exists(name) else None
+    path = os.path.join(image_root(), name)
+    return open(path, 'rb') if os.path.isfile(path) else None
+
+
+def image_exists(name):
+    """True if the thumbnail file is present (storage or seeded static folder)."""
+    if not name or '://' in name:
+        return False
+    if is_stored_image(name):
+        return product_image_storage().exists(name)
+    return os.path.isfile(os.path.join(image_root(), name))
+
+
+def attach_renditions(product):
+    """
+    Generate renditions for product.thumbnail and store the result on the product.
+    Remote URLs and missing/broken files are skipped.
+    """
+    name = product.thumbnail.name if product.thumbnail else ''
+    source = open_image(name)
+    if source is None:
+        return None
+
+    try:
+        with source:
+            renditions = generate_renditions(source)
+    except (OSError, ValueError) as exc:
+        logger.warning("Could not generate renditions for %s: %s", name, exc)
+        return None
+
+    # update() instead of save(): don't rewrite the row or fire the product signals again
+    type(product).objects.filter(pk=product.pk).update(image_renditions=renditions, updated_at=timezone.now())
+    product.image_renditions = renditions
+    return renditions
+
+
+def clear_renditions(product):
+    """
+    Forget the renditions of a replaced thumbnail (call before saving). Encoding is never
+    done in the request: `generate_renditions --loop` picks up products without renditions,
+    and until then the card shows the original thumbnail.
+    """
+    product.image_renditions = {}
+
+
+def srcset(renditions, fmt):
+    """'url 160w, url 320w, ...' for one format, or '' if the product has no renditions."""
+    if not renditions or not renditions.get('key'):
+        return ''
+    storage = product_image_storage()
+    return ', '.join(
+        f"{storage.url(rendition_name(renditions['key'], width, fmt))} {width}w"
+        for width in renditions['widths']
+    )
+
+
+def picture_sources(renditions):
+    """
+    Template data for <picture>: the modern formats as <source> elements and the PNG
+    fallback (srcset + smallest-above-320 src) for the <img>. None without renditions.
+    """
+    if not renditions or not renditions.get('key'):
+        return None
+    widths = renditions['widths']
+    default_width = next((width for width in widths if width >= 320), widths[-1])
+    return {
+        'sources': [
+            {'type': mime, 'srcset': srcset(renditions, fmt)}
+            for fmt, (_, mime, _) in RENDITION_FORMATS.items()
+            if fmt != FALLBACK_FORMAT
+        ],
+        'srcset': srcset(renditions, FALLBACK_FORMAT),
+        'src': product_image_storage().url(rendition_name(renditions['key'], default_width, FALLBACK_FORMAT)),
+        'sizes': CARD_SIZES,
+    }
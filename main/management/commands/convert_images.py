@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from main.images import save_atomic
+
+MANIFEST_NAME = '.convert-manifest.json'
+
+# format -> (Pillow format, extension, lossy?)
+OUTPUT_FORMATS = {
+    'png': ('PNG', 'png', False),
+    'webp': ('WEBP', 'webp', True),
+    'avif': ('AVIF', 'avif', True),
+    'jpeg': ('JPEG', 'jpg', True),
+}
+DEFAULT_QUALITY = 80
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_options(fmt, quality, compress_level):
+    if OUTPUT_FORMATS[fmt][2]:
+        return {'quality': quality}
+    return {'compress_level': compress_level}
+
+
+def _flatten(image):
+    # Flutter Web tidak selalu bisa menampilkan alpha AVIF, jadi latar transparan diganti putih
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB') if image.mode != 'RGB' else image
+
+
+def convert_one(source, output_dir, jobs):
+    """
+    Worker: decode source once and write it in every (format, options) of jobs.
+    Runs in a child process, so it only touches the filesystem, never the database.
+    Returns (bytes read, bytes written).
+    """
+    written = 0
+    with Image.open(source) as opened:
+        image = _flatten(opened)
+        for fmt, options in jobs:
+            pil_format, extension, _ = OUTPUT_FORMATS[fmt]
+            target = os.path.join(output_dir, f"{Path(source).stem}.{extension}")
+            save_atomic(image, target, pil_format, **options)
+            written += os.path.getsize(target)
+    return os.path.getsize(source), written
+
+
+def load_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as manifest:
+            return json.load(manifest)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path, manifest):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+        json.dump(manifest, tmp, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class Command(BaseCommand):
+    help = 'Convert product images (default: .avif -> .png) in parallel, skipping sources that did not change'
+
+    def add_arguments(self, parser):
+        default_dir = os.path.join(settings.BASE_DIR, 'static', 'image', 'products')
+        parser.add_argument('--source', default=default_dir, help='Folder with the source images')
+        parser.add_argument('--output', help='Output folder (default: the source folder)')
+        parser.add_argument('--manifest', help=f'Manifest file (default: {MANIFEST_NAME} in --output, '
+                                               f'or .cache/ in the project when writing next to the sources)')
+        parser.add_argument('--pattern', default='*.avif', help='Glob of source files (default: *.avif)')
+        parser.add_argument('--formats', default='png', help=f"Comma separated, any of {', '.join(OUTPUT_FORMATS)}")
+        parser.add_argument('--quality', type=int, default=DEFAULT_QUALITY, help='Quality for webp/avif/jpeg (1-100)')
+        parser.add_argument('--compress-level', type=int, default=6, help='zlib level for png (0-9)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes (default: all cores)')
+        parser.add_argument('--force', action='store_true', help='Re-encode even if the manifest says it is up to date')
+
+    def handle(self, *args, **options):
+        source_dir = Path(options['source'])
+        output_dir = Path(options['output'] or source_dir)
+        if not source_dir.is_dir():
+            raise CommandError(f"Directory {source_dir} does not exist")
+
+        formats = [fmt.strip().lower() for fmt in options['formats'].split(',') if fmt.strip()]
+        unknown = [fmt for fmt in formats if fmt not in OUTPUT_FORMATS]
+        if unknown or not formats:
+            raise CommandError(f"Unknown format(s): {', '.join(unknown) or '-'}; choose from {', '.join(OUTPUT_FORMATS)}")
+        if not 1 <= options['quality'] <= 100:
+            raise CommandError("--quality must be between 1 and 100")
+
+        sources = sorted(source_dir.glob(options['pattern']))
+        # e.g. --formats avif without --output would re-encode every source onto itself
+        overwriting = [
+            fmt for fmt in formats
+            if output_dir.resolve() == source_dir.resolve()
+            and any(source.suffix.lower() == f".{OUTPUT_FORMATS[fmt][1]}" for source in sources)
+        ]
+        if overwriting:
+            raise CommandError(
+                f"--formats {', '.join(overwriting)} would overwrite the source files; pass a different --output"
+            )
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+        # by default not in static/ (collectstatic would publish it next to the images)
+        if options['manifest']:
+            manifest_path = Path(options['manifest'])
+        elif options['output']:
+            manifest_path = output_dir / MANIFEST_NAME
+        else:
+            manifest_path = Path(settings.BASE_DIR) / '.cache' / MANIFEST_NAME
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        manifest_path = str(manifest_path)
+        manifest = {} if options['force'] else load_manifest(manifest_path)
+        jobs = [(fmt, encode_options(fmt, options['quality'], options['compress_level'])) for fmt in formats]
+
+        started = time.monotonic()
+        pending = {}
+        for source in sources:
+            stat = source.stat()
+            entry = manifest.get(source.name, {})
+            todo = [
+                (fmt, opts) for fmt, opts in jobs
+                if entry.get('outputs', {}).get(fmt) != opts
+                or not (output_dir / f"{source.stem}.{OUTPUT_FORMATS[fmt][1]}").exists()
+            ]
+            unchanged_stat = (entry.get('size'), entry.get('mtime_ns')) == (stat.st_size, stat.st_mtime_ns)
+            if not todo and unchanged_stat:
+                continue
+
+            # size/mtime changed (e.g. a fresh checkout): only the content hash decides
+            digest = file_sha256(source)
+            if digest != entry.get('sha256'):
+                entry = {'outputs': {}}
+                todo = jobs
+            entry.update(sha256=digest, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            manifest[source.name] = entry
+            if todo:
+                pending[source] = todo
+
+        skipped = len(sources) - len(pending)
+        self.stdout.write(f"{len(sources)} source files, {len(pending)} to convert, {skipped} up to date")
+
+        converted = failed = bytes_in = bytes_out = 0
+        workers = max(1, min(options['workers'], len(pending)))
+        with ProcessPoolExecutor(max_workers=workers) if workers > 1 else _InlineExecutor() as pool:
+            futures = {pool.submit(convert_one, str(source), str(output_dir), todo): source for source, todo in pending.items()}
+            for done, future in enumerate(as_completed(futures), start=1):
+                source = futures[future]
+                try:
+                    read, written = future.result()
+                except Exception as exc:
+                    failed += 1
+                    manifest.pop(source.name, None)
+                    self.stdout.write(self.style.ERROR(f"[{done}/{len(pending)}] ✗ {source.name}: {exc}"))
+                    continue
+                converted += 1
+                bytes_in += read
+                bytes_out += written
+                manifest[source.name]['outputs'].update(dict(pending[source]))
+                self.stdout.write(f"[{done}/{len(pending)}] ✓ {source.name}")
+
+        save_manifest(manifest_path, manifest)
+
+        elapsed = time.monotonic() - started
+        rate = converted / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Converted {converted}, failed {failed}, skipped {skipped} in {elapsed:.2f}s "
+            f"({rate:.1f} files/s, {bytes_in / 1e6:.1f} MB in, {bytes_out / 1e6:.1f} MB out, {workers} workers)"
+        ))
+
+
+class _InlineExecutor:
+    """Stand-in for ProcessPoolExecutor when one worker is enough (no fork overhead)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
@@ -0,0 +1,70 @@
+import re
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from main.models import Product
+from auction.models import Bid
+from auction.tasks import expired_auctions
+from chat.models import ConversationMessage
+from checkout.models import Order
+from comments.models import Comment
+
+
+def hot_queries():
+    """(name, queryset) for the filters the views run on every request."""
+    some_id = uuid.uuid4()
+    return [
+        ('home grid', Product.objects.filter(is_auction=False).order_by('-count_sold', '-id')[:24]),
+        ('my products', Product.objects.filter(user_id=1, is_auction=False).order_by('-count_sold', '-id')[:24]),
+        ('auction list', Product.objects.filter(is_auction=True).order_by('-auction_end_time')),
+        ('auction settlement', expired_auctions(timezone.now())[:200]),
+        ('search filters', Product.objects.filter(
+            is_auction=False, category="Men's Shoes", price__gte=500000, price__lte=2000000,
+        )),
+        ('bid history', Bid.objects.filter(product_id=some_id).order_by('-amount')),
+        ('unread count', ConversationMessage.objects.filter(
+            conversation_id=some_id, is_read=False,
+        ).exclude(sender_id=1)),
+        ('chat history', ConversationMessage.objects.filter(conversation_id=some_id).order_by('-created_at')[:50]),
+        ('order list', Order.objects.filter(user_id=1).order_by('-created_at')),
+        ('product reviews', Comment.objects.filter(product_id=some_id).order_by('-created_at')[:20]),
+    ]
+
+
+def full_scan(plan, table):
+    """True if the plan reads the whole table instead of going through an index."""
+    if connection.vendor == 'postgresql':
+        return re.search(rf'Seq Scan on {table}\b', plan) is not None
+    if connection.vendor == 'sqlite':
+        # "SCAN main_product" (or "SCAN TABLE ..." on older SQLite) without "USING ... INDEX"
+        return re.search(rf'\bSCAN (TABLE )?{table}\b(?! USING)', plan) is not None
+    return False
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot queries from the views and fail if one of them falls back to a full table scan'
+
+    def handle(self, *args, **options):
+        failures = []
+
+        for name, queryset in hot_queries():
+            table = queryset.model._meta.db_table
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    # small tables are always seq-scanned; ask whether an index *could* be used
+                    with connection.cursor() as cursor:
+                        cursor.execute("SET LOCAL enable_seqscan = off")
+                plan = queryset.explain()
+
+            if full_scan(plan, table):
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"✗ {name}: full scan on {table}"))
+                self.stdout.write(plan)
+            else:
+                self.stdout.write(self.style.SUCCESS(f"✓ {name}"))
+
+        if failures:
+            raise CommandError(f"Full table scan in: {', '.join(failures)}")
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.images import attach_renditions
+from main.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Generate AVIF/WebP/PNG thumbnail renditions for products that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Also re-check products that already have renditions')
+        parser.add_argument('--loop', action='store_true', help='Keep running and pick up new uploads every --interval seconds')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between passes in --loop mode')
+
+    def handle(self, *args, **options):
+        recheck_all = options['all']
+        skipped = {}  # pk -> thumbnail that could not be encoded (missing/remote/broken); retried once it changes
+        try:
+            while True:
+                done, failed = self._generate(recheck_all, skipped)
+                if done or failed or not options['loop']:
+                    self.stdout.write(self.style.SUCCESS(f"✅ Renditions ready for {done} products ({failed} skipped)"))
+                if not options['loop']:
+                    break
+                recheck_all = False
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Rendition worker stopped.'))
+
+    def _generate(self, recheck_all, skipped):
+        products = Product.objects.exclude(thumbnail='').exclude(thumbnail__isnull=True)
+        if not recheck_all:
+            products = products.filter(image_renditions={})
+
+        done = failed = 0
+        for product in products.only('id', 'thumbnail', 'image_renditions').iterator():
+            if not recheck_all and skipped.get(product.pk) == product.thumbnail.name:
+                continue
+            if attach_renditions(product):
+                done += 1
+                skipped.pop(product.pk, None)
+            else:
+                failed += 1
+                skipped[product.pk] = product.thumbnail.name
+        return done, failed
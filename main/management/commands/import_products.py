@@ -7,7 +7,7 @@ class Command(BaseCommand):
     help = 'Import products from CSV using .avif images named 1.avif, 2.avif, etc.'
 
     def handle(self, *args, **options):
-        csv_path = os.path.join(settings.BASE_DIR, 'static', 'data', 'products.csv')
+        csv_path = getattr(settings, 'PRODUCT_DATASET_CSV', os.path.join(settings.BASE_DIR, 'static', 'data', 'products.csv'))
 
         if not os.path.exists(csv_path):
             self.stdout.write(self.style.ERROR(f"❌ CSV file not found at {csv_path}"))
@@ -38,3 +38,5 @@ class Command(BaseCommand):
                     count += 1
 
             self.stdout.write(self.style.SUCCESS(f"✅ Successfully imported {count} products with .avif images!"))
+            if count:
+                self.stdout.write("Run `python manage.py generate_renditions` to build the thumbnail renditions.")
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from main.images import image_exists
+from main.models import Product
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Point product thumbnails at another extension (default .avif -> .png) in batched bulk updates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-ext', default='.avif', help='Extension to replace (default: .avif)')
+        parser.add_argument('--to-ext', default='.png', help='New extension (default: .png); swap both to roll back')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change, write nothing')
+        parser.add_argument('--strict', action='store_true', help='Abort (and write nothing) if any target file is missing')
+
+    def handle(self, *args, **options):
+        from_ext, to_ext = options['from_ext'], options['to_ext']
+        if not from_ext.startswith('.') or not to_ext.startswith('.'):
+            raise CommandError("Extensions must start with a dot, e.g. --from-ext .avif")
+        batch_size = max(1, options['batch_size'])
+
+        products = (
+            Product.objects.filter(thumbnail__endswith=from_ext)
+            .only('id', 'thumbnail')
+            .order_by('pk')
+        )
+
+        updated = 0
+        missing = []
+        now = timezone.now()
+        # satu transaksi untuk semua batch: gagal di tengah jalan = tidak ada yang berubah
+        with transaction.atomic():
+            batch = []
+            for product in products.iterator(chunk_size=batch_size):
+                old_name = product.thumbnail.name
+                new_name = old_name[:-len(from_ext)] + to_ext
+                if not image_exists(new_name):
+                    missing.append(new_name)
+                    continue
+
+                product.thumbnail = new_name
+                product.updated_at = now  # product card cache is keyed on updated_at
+                batch.append(product)
+                if len(batch) >= batch_size:
+                    updated += self._flush(batch, options['dry_run'])
+                    batch = []
+            updated += self._flush(batch, options['dry_run'])
+
+            if missing and options['strict']:
+                raise CommandError(f"{len(missing)} target files missing (nothing written), e.g. {missing[0]}")
+            if options['dry_run']:
+                transaction.set_rollback(True)
+
+        for name in missing[:20]:
+            self.stdout.write(self.style.WARNING(f"✗ missing on disk: {name}"))
+        if len(missing) > 20:
+            self.stdout.write(self.style.WARNING(f"  ... and {len(missing) - 20} more"))
+
+        verb = "Would update" if options['dry_run'] else "Updated"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {updated} products ({from_ext} -> {to_ext}), {len(missing)} skipped"
+        ))
+
+    def _flush(self, batch, dry_run):
+        if batch and not dry_run:
+            Product.objects.bulk_update(batch, ['thumbnail', 'updated_at'])
+        return len(batch)
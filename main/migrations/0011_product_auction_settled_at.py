@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:22
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_won_auctions_settled(apps, schema_editor):
+    Product = apps.get_model('main', 'Product')
+    Product.objects.filter(is_auction=True, auction_winner__isnull=False).update(
+        auction_settled_at=F('auction_end_time')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_product_auction_end_time_product_auction_increment_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='auction_settled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('auction_settled_at__isnull', True), ('is_auction', True)), fields=['auction_end_time'], name='product_unsettled_end_idx'),
+        ),
+        # Auctions whose winner was already picked by the old check_auction_end view
+        migrations.RunPython(mark_won_auctions_settled, migrations.RunPython.noop),
+    ]
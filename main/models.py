@@ -4,6 +4,8 @@ from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from main.images import image_url, picture_sources
+
 class Product(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
 
@@ -18,6 +20,8 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=0, default=0)
     category = models.CharField(max_length=30, choices=CATEGORY_CHOICES, default="Men's Shoes")
     thumbnail = models.ImageField(upload_to='image/products/temp/', null=True, blank=True)
+    # {'key': <content hash>, 'widths': [...]} from main.images.generate_renditions
+    image_renditions = models.JSONField(default=dict, blank=True)
     count_sold = models.PositiveIntegerField(default=0)
     stock = models.PositiveIntegerField(default=10)
     is_auction = models.BooleanField(default=False)
@@ -29,7 +33,42 @@ class Product(models.Model):
         blank=True, 
         related_name='auction_wins'
     )
+    auction_settled_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Settlement worker scans unsettled auctions by end time
+            models.Index(
+                fields=['auction_end_time'],
+                name='product_unsettled_end_idx',
+                condition=models.Q(is_auction=True, auction_settled_at__isnull=True),
+            ),
+            # Home grid / JSON feed: non-auction products, best sellers first
+            models.Index(
+                fields=['-count_sold', '-id'],
+                name='product_listing_idx',
+                condition=models.Q(is_auction=False),
+            ),
+            # "My products" filter on the home page
+            models.Index(
+                fields=['user', '-count_sold', '-id'],
+                name='product_seller_listing_idx',
+                condition=models.Q(is_auction=False),
+            ),
+            # Auction list ordered by end time
+            models.Index(
+                fields=['-auction_end_time'],
+                name='product_auction_end_idx',
+                condition=models.Q(is_auction=True),
+            ),
+            # Search filters: category + price range
+            models.Index(
+                fields=['category', 'price'],
+                name='product_category_price_idx',
+                condition=models.Q(is_auction=False),
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -37,6 +76,16 @@ class Product(models.Model):
     def is_in_stock(self):
         return self.stock > 0
 
+    @property
+    def thumbnail_url(self):
+        """URL of the original thumbnail: media storage for uploads, static for the seeded images."""
+        return image_url(self.thumbnail.name) if self.thumbnail else ''
+
+    @property
+    def picture(self):
+        """<picture> sources/srcset for the thumbnail renditions, None if not generated yet."""
+        return picture_sources(self.image_renditions)
+
 
 class Profile(models.Model):
     ROLE_CHOICES = [
@@ -58,3 +107,31 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
         Profile.objects.create(user=instance, role='buyer')
     else:
         instance.profile.save()
+
+
+class IdempotencyKey(models.Model):
+    """
+    Respons yang sudah dikirim untuk satu Idempotency-Key, supaya request yang di-retry
+    (mis. koneksi mobile putus) mendapat respons yang sama tanpa membuat order/bid baru.
+    status_code kosong berarti request pertama masih diproses.
+    """
+    scope = models.CharField(max_length=50)
+    owner = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'owner', 'key'], name='idempotency_key_unique'),
+        ]
+        indexes = [
+            # Purging expired keys
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key}"
@@ -0,0 +1,77 @@
+import queue
+import threading
+from collections import defaultdict
+
+
+class Subscription:
+    """Antrian event milik satu pendengar (satu tab browser / satu koneksi)."""
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Slow listener: drop the event rather than block the publisher
+            pass
+
+    def get(self, timeout=None):
+        """Next event, or None if nothing arrived within timeout seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Broker:
+    """
+    In-process publish/subscribe hub.
+    Publishing is one fan-out over the subscribers of a channel, so hundreds of
+    watchers cost a queue put each instead of a database query each.
+    Works within one server process (runserver, threaded gunicorn workers).
+    """
+
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._channels = defaultdict(set)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.maxsize)
+        with self._lock:
+            self._channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            listeners = self._channels.get(subscription.channel)
+            if listeners is not None:
+                listeners.discard(subscription)
+                if not listeners:
+                    del self._channels[subscription.channel]
+
+    def publish(self, channel, event):
+        with self._lock:
+            listeners = list(self._channels.get(channel, ()))
+        for subscription in listeners:
+            subscription.put(event)
+        return len(listeners)
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._channels.get(channel, ()))
+
+
+broker = Broker()
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent with sender=Product and product_ids=[...] after rows were changed by a queryset
+# update() (e.g. checkout taking stock), which does not fire post_save.
+products_updated = Signal()
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage, InMemoryStorage, storages
+
+PRODUCT_IMAGE_DIR = 'image/products'
+IMAGE_EXTENSIONS = ('.avif', '.webp', '.png', '.jpg', '.jpeg')
+DEFAULT_EXTENSION = '.avif'
+
+
+def image_extension(filename):
+    extension = os.path.splitext(filename or '')[1].lower()
+    return extension if extension in IMAGE_EXTENSIONS else DEFAULT_EXTENSION
+
+
+class ContentHashedMixin:
+    """
+    Storage mixin that names product images by the sha256 of their bytes:
+    image/products/<h[:2]>/<h>.<ext>. The same upload is stored once, nothing has to
+    list the folder to pick a name, and a name is never reused for other content.
+    """
+    directory = PRODUCT_IMAGE_DIR
+
+    def hashed_name(self, digest, extension):
+        return f"{self.directory}/{digest[:2]}/{digest}{extension}"
+
+    def save_hashed(self, content, filename=None):
+        """Store an uploaded File and return its name (relative to the storage root)."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        name = self.hashed_name(digest.hexdigest(), image_extension(filename or content.name))
+        if not self.exists(name):
+            content.seek(0)
+            self.save(name, content)
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # same name == same bytes, so there is nothing to disambiguate
+        return name
+
+
+class ProductImageStorage(ContentHashedMixin, FileSystemStorage):
+    """Local product image storage; hashes while writing a temp file, then renames it into place."""
+
+    def save_hashed(self, content, filename=None):
+        incoming = self.path(os.path.join(self.directory, '.incoming'))
+        os.makedirs(incoming, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=incoming, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            os.chmod(tmp_path, self.file_permissions_mode or 0o644)
+
+            name = self.hashed_name(digest.hexdigest(), image_extension(filename or content.name))
+            target = self.path(name)
+            if os.path.exists(target):
+                os.unlink(tmp_path)  # duplicate upload
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return name
+
+    def _save(self, name, content):
+        # temp file + rename: readers never see a half-written image, and saving an
+        # existing (identical) name simply replaces it
+        target = self.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    tmp.write(chunk)
+            os.chmod(tmp_path, self.file_permissions_mode or 0o644)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return name
+
+
+class InMemoryProductImageStorage(ContentHashedMixin, InMemoryStorage):
+    """Object-storage stand-in for tests: same naming, nothing touches the disk."""
+
+
+def product_image_storage():
+    """The configured STORAGES['product_images'] backend."""
+    return storages['product_images']
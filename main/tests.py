@@ -1,13 +1,36 @@
-from django.test import TestCase, Client
-from django.urls import reverse
-from django.contrib.auth.models import User
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management import call_command
-from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from comments.testing import create_review
+from main.catalog import REVIEW_PAGE_SIZE, serialize_product, stream_catalog_xml
+from main.image_proxy import RemoteImageCache
+from main.images import attach_renditions, generate_renditions, rendition_name
+from main.management.commands.explain_hot_queries import full_scan
 from main.models import Product, Profile
-import os, csv, tempfile
-from django.contrib.auth.models import AnonymousUser
-from django.contrib.messages import get_messages
+from main.storage import ProductImageStorage
+from main.views import HOME_PAGE_SIZE, render_product_cards
 
 
 class MainAppTests(TestCase):
@@ -210,3 +233,562 @@ Adidas Boost,1500000,Men's Shoes
         self.client.force_login(self.seller_user)
         response = self.client.get(reverse('main:show_main') + "?filter=my")
         self.assertEqual(response.status_code, 200)
+
+
+class CatalogSerializerTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.seller = User.objects.create_user(username='seller', password='12345')
+        Profile.objects.filter(user=self.seller).update(role='seller')
+        self.buyer = User.objects.create_user(username='buyer', password='12345')
+
+    def _create_reviewed_product(self, index):
+        product = Product.objects.create(
+            title=f"Shoe {index}", price=100000, category="Men's Shoes", user=self.seller
+        )
+        create_review(product, buyer=self.buyer, content="Mantap", reply_author=self.seller)
+        return product
+
+    def _get_json(self):
+        response = self.client.get(reverse('main:show_json'))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_show_json_shape(self):
+        product = self._create_reviewed_product(1)
+        data = self._get_json()
+
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]['pk'], str(product.id))
+        comment = data[0]['fields']['comments'][0]
+        self.assertEqual(comment['comment_author_username'], 'buyer')
+        self.assertEqual(comment['comment_author_role'], 'buyer')
+        reply = comment['replies'][0]
+        self.assertEqual(reply['reply_author_username'], 'seller')
+        self.assertEqual(reply['reply_author_role'], 'seller')
+
+    def test_show_json_query_count_is_constant(self):
+        self._create_reviewed_product(1)
+        with self.assertNumQueries(3):
+            self._get_json()
+
+        for index in range(2, 8):
+            self._create_reviewed_product(index)
+        with self.assertNumQueries(3):
+            data = self._get_json()
+        self.assertEqual(len(data), 7)
+
+
+class ProductFeedTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('main:show_json_feed')
+        for index in range(7):
+            Product.objects.create(title=f"Feed Shoe {index}", price=100000, count_sold=index % 3)
+        Product.objects.create(title="Auction Shoe", price=100000, is_auction=True)
+
+    def test_feed_walks_whole_catalog_without_duplicates(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'page_size': 3}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(self.url, params).json()
+            seen.extend(item['pk'] for item in data['products'])
+            cursor = data['next_cursor']
+            if not data['has_more']:
+                break
+
+        expected = list(
+            Product.objects.filter(is_auction=False)
+            .order_by('-count_sold', '-id')
+            .values_list('id', flat=True)
+        )
+        self.assertEqual(seen, [str(pk) for pk in expected])
+
+    def test_feed_can_skip_comments(self):
+        data = self.client.get(self.url, {'comments': '0'}).json()
+        self.assertNotIn('comments', data['products'][0]['fields'])
+        data = self.client.get(self.url).json()
+        self.assertIn('comments', data['products'][0]['fields'])
+
+    def test_feed_rejects_bad_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogStreamingExportTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        for index in range(5):
+            Product.objects.create(title=f"Export Shoe {index}", price=100000)
+        Product.objects.create(title="Auction Shoe", price=100000, is_auction=True)
+
+    def test_streamed_json_matches_buffered_json(self):
+        buffered = self.client.get(reverse('main:show_json')).json()
+        response = self.client.get(reverse('main:show_json'), {'stream': '1'})
+        self.assertTrue(response.streaming)
+        streamed = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(streamed, buffered)
+
+    def test_ndjson_export(self):
+        response = self.client.get(reverse('main:show_json'), {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[0])['model'], 'main.product')
+
+    def test_streamed_xml_matches_buffered_xml(self):
+        buffered = self.client.get(reverse('main:show_xml')).content.decode()
+        streamed = ''.join(stream_catalog_xml(chunk_size=2))
+        self.assertEqual(streamed, buffered)
+
+        response = self.client.get(reverse('main:show_xml'), {'stream': '1'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content).decode(), buffered)
+
+
+class HomeGridTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.seller = User.objects.create_user(username='seller', password='12345')
+        Profile.objects.filter(user=self.seller).update(role='seller')
+        self.buyer = User.objects.create_user(username='buyer', password='12345')
+
+    def _create_products(self, count, user=None):
+        return [
+            Product.objects.create(title=f"Grid Shoe {index}", price=100000, user=user or self.seller)
+            for index in range(count)
+        ]
+
+    def test_home_grid_is_paginated(self):
+        self._create_products(HOME_PAGE_SIZE + 3)
+        response = self.client.get(reverse('main:show_main'))
+        self.assertEqual(len(response.context['product_cards']), HOME_PAGE_SIZE)
+        response = self.client.get(reverse('main:show_main'), {'page': 2})
+        self.assertEqual(len(response.context['product_cards']), 3)
+
+    def test_query_count_does_not_grow_with_cards(self):
+        self.client.force_login(self.buyer)
+        self._create_products(2)
+        with self.assertNumQueries(5):
+            self.client.get(reverse('main:show_main'))
+
+        self._create_products(10)
+        with self.assertNumQueries(5):
+            self.client.get(reverse('main:show_main'))
+
+    def test_cached_card_varies_by_viewer_and_version(self):
+        product = self._create_products(1)[0]
+        edit_url = reverse('main:edit_product', args=[product.id])
+
+        self.client.force_login(self.seller)
+        self.assertContains(self.client.get(reverse('main:show_main')), edit_url)
+
+        self.client.force_login(self.buyer)
+        self.assertNotContains(self.client.get(reverse('main:show_main')), edit_url)
+
+        product.title = "Renamed Shoe"
+        product.save()
+        self.assertContains(self.client.get(reverse('main:show_main')), "Renamed Shoe")
+
+
+class ProductDetailReviewTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.seller = User.objects.create_user(username='seller', password='12345')
+        Profile.objects.filter(user=self.seller).update(role='seller')
+        self.product = Product.objects.create(title="Reviewed Shoe", price=100000, user=self.seller)
+        self.viewer = User.objects.create_user(username='viewer', password='12345')
+        self.client.force_login(self.viewer)
+
+    def _add_reviews(self, start, count):
+        for index in range(start, start + count):
+            create_review(
+                self.product, rating=4, buyer=User.objects.create_user(username=f'buyer{index}', password='12345'),
+                content=f"Ulasan {index}", reply_author=self.seller, reply=f"Balasan {index}",
+            )
+
+    def _get_detail(self, **params):
+        response = self.client.get(reverse('main:show_product', args=[self.product.id]), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_reviews_are_paginated(self):
+        self._add_reviews(0, REVIEW_PAGE_SIZE + 2)
+        response = self._get_detail()
+        self.assertEqual(response.context['review_count'], REVIEW_PAGE_SIZE + 2)
+        self.assertEqual(len(response.context['reviews']), REVIEW_PAGE_SIZE)
+        self.assertContains(response, "Balasan")
+
+        response = self._get_detail(reviews=2)
+        self.assertEqual(len(response.context['reviews']), 2)
+
+    def test_query_count_does_not_grow_with_reviews(self):
+        self._add_reviews(0, 2)
+        with self.assertNumQueries(7):
+            self._get_detail()
+
+        self._add_reviews(2, 15)
+        with self.assertNumQueries(7):
+            response = self._get_detail()
+        self.assertContains(response, "buyer16")
+
+
+class HotQueryIndexTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = io.StringIO()
+        call_command('explain_hot_queries', stdout=out)
+        self.assertNotIn("full scan", out.getvalue())
+
+    def test_full_scan_is_detected(self):
+        plan = Product.objects.filter(title="Nike").explain()
+        if connection.vendor in ('sqlite', 'postgresql'):
+            self.assertTrue(full_scan(plan, Product._meta.db_table))
+
+
+class ProductImageRenditionTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.settings_override = override_settings(PRODUCT_IMAGE_ROOT=self.root, STORAGES={
+            **settings.STORAGES,
+            'product_images': {
+                'BACKEND': 'main.storage.ProductImageStorage',
+                'OPTIONS': {'location': self.media, 'base_url': '/media/'},
+            },
+        })
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        os.makedirs(os.path.join(self.root, 'image', 'products'))
+        self.source = os.path.join(self.root, 'image', 'products', '1.png')
+        Image.new('RGB', (700, 400), (200, 30, 30)).save(self.source)
+        self.product = Product.objects.create(title="Sepatu Foto", price=500000, thumbnail='image/products/1.png')
+
+    def test_renditions_are_content_addressed_and_never_upscaled(self):
+        renditions = generate_renditions(self.source)
+        self.assertEqual(renditions['widths'], [160, 320, 640])
+
+        # written to the media-backed storage, never next to the static sources
+        small = os.path.join(self.media, rendition_name(renditions['key'], 160, 'webp'))
+        with Image.open(small) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (160, 91)))
+        for fmt in ('avif', 'png'):
+            self.assertTrue(storages['product_images'].exists(rendition_name(renditions['key'], 640, fmt)))
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'image', 'renditions')))
+
+        # same bytes -> same key, existing files are not encoded again
+        copy = os.path.join(self.root, 'image', 'products', '2.png')
+        shutil.copy(self.source, copy)
+        before = os.path.getmtime(small)
+        self.assertEqual(generate_renditions(copy), renditions)
+        self.assertEqual(os.path.getmtime(small), before)
+
+    def test_card_and_json_expose_srcset(self):
+        attach_renditions(self.product)
+        self.product.refresh_from_db()
+        key = self.product.image_renditions['key']
+
+        card = render_product_cards([self.product], AnonymousUser())[0]
+        self.assertIn('type="image/avif"', card)
+        self.assertIn(f"/media/{rendition_name(key, 320, 'webp')} 320w", card)
+
+        data = serialize_product(self.product, include_comments=False)['fields']
+        self.assertEqual(set(data['srcset']), {'avif', 'webp', 'png'})
+        self.assertTrue(data['srcset']['png'].endswith(f"/media/{rendition_name(key, 640, 'png')} 640w"))
+
+    def test_uploaded_thumbnail_is_served_from_media(self):
+        with open(self.source, 'rb') as source:
+            name = storages['product_images'].save_hashed(ContentFile(source.read(), name='foto.png'))
+        product = Product.objects.create(title="Sepatu Upload", price=1, thumbnail=name)
+
+        self.assertEqual(product.thumbnail_url, f'/media/{name}')
+        self.assertEqual(self.product.thumbnail_url, '/static/image/products/1.png')
+        self.assertIn(f'src="/media/{name}"', render_product_cards([product], AnonymousUser())[0])
+        self.assertEqual(attach_renditions(product)['widths'], [160, 320, 640])
+
+    def test_bulk_import_leaves_renditions_to_the_command(self):
+        admin = User.objects.create_superuser(username='root', password='12345')
+        self.client.force_login(admin)
+        csv_path = os.path.join(self.root, 'products.csv')
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            f.write("Product Name,Price (IDR),Category\nSepatu Impor,100000,Men's Shoes\n")
+
+        with override_settings(PRODUCT_DATASET_CSV=csv_path), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(reverse('main:load_dataset'))
+        self.assertIn('generate_renditions', response.json()['message'])
+        self.assertEqual(Product.objects.get(title="Sepatu Impor").image_renditions, {})
+        self.assertFalse(os.path.exists(os.path.join(self.media, 'image', 'renditions')))
+
+    def test_upload_leaves_encoding_to_the_worker(self):
+        self.client.force_login(User.objects.create_user(username='seller', password='12345'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('main:create_product_flutter'),
+                data=json.dumps({'title': "Sepatu Baru", 'price': 100000, 'thumbnail': 'image/products/1.png'}),
+                content_type='application/json',
+            )
+        product = Product.objects.get(title="Sepatu Baru")
+        self.assertEqual(product.image_renditions, {})
+        self.assertFalse(os.path.exists(os.path.join(self.media, 'image', 'renditions')))
+
+        # one pass of the worker loop, then it is stopped
+        out = io.StringIO()
+        with mock.patch('main.management.commands.generate_renditions.time.sleep', side_effect=KeyboardInterrupt):
+            call_command('generate_renditions', '--loop', stdout=out)
+        self.assertIn("Rendition worker stopped", out.getvalue())
+        product.refresh_from_db()
+        self.assertEqual(product.image_renditions['widths'], [160, 320, 640])
+
+        # a new thumbnail drops the old renditions until the worker has run again
+        self.client.post(
+            reverse('main:edit_product_flutter', args=[product.pk]),
+            data=json.dumps({'thumbnail': 'image/products/2.png'}),
+            content_type='application/json',
+        )
+        product.refresh_from_db()
+        self.assertEqual(product.image_renditions, {})
+
+    def test_backfill_command_skips_missing_files(self):
+        Product.objects.create(title="Tanpa File", price=1, thumbnail='image/products/404.avif')
+        out = io.StringIO()
+        call_command('generate_renditions', stdout=out)
+        self.assertIn("1 products (1 skipped)", out.getvalue())
+        self.product.refresh_from_db()
+        self.assertTrue(self.product.image_renditions)
+
+
+class ConvertImagesCommandTests(TestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, self.output)
+        for index, color in enumerate(['red', 'blue', 'green'], start=1):
+            Image.new('RGBA', (64, 48), color).save(os.path.join(self.source, f'{index}.avif'))
+
+    def _convert(self, *args):
+        out = io.StringIO()
+        call_command('convert_images', '--source', self.source, '--output', self.output, *args, stdout=out)
+        return out.getvalue()
+
+    def test_converts_in_parallel_then_skips_unchanged(self):
+        self.assertIn("Converted 3, failed 0, skipped 0", self._convert('--formats', 'png,webp', '--workers', '2'))
+        self.assertEqual(sorted(f for f in os.listdir(self.output) if not f.startswith('.')),
+                         ['1.png', '1.webp', '2.png', '2.webp', '3.png', '3.webp'])
+        with Image.open(os.path.join(self.output, '1.png')) as image:
+            self.assertEqual(image.mode, 'RGB')
+
+        self.assertIn("Converted 0, failed 0, skipped 3", self._convert('--formats', 'png,webp'))
+
+        Image.new('RGB', (64, 48), 'black').save(os.path.join(self.source, '2.avif'))
+        self.assertIn("Converted 1, failed 0, skipped 2", self._convert('--formats', 'png,webp'))
+
+    def test_new_quality_reencodes_only_that_format(self):
+        self._convert('--formats', 'png,webp')
+        png_mtime = os.path.getmtime(os.path.join(self.output, '1.png'))
+
+        self.assertIn("Converted 3", self._convert('--formats', 'png,webp', '--quality', '40'))
+        self.assertEqual(os.path.getmtime(os.path.join(self.output, '1.png')), png_mtime)
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(CommandError):
+            self._convert('--formats', 'gif')
+
+    def test_refuses_to_overwrite_the_sources(self):
+        before = os.path.getmtime(os.path.join(self.source, '1.avif'))
+        with self.assertRaises(CommandError):
+            call_command('convert_images', '--source', self.source, '--formats', 'png,avif', stdout=io.StringIO())
+        self.assertEqual(os.path.getmtime(os.path.join(self.source, '1.avif')), before)
+        self.assertEqual(sorted(os.listdir(self.source)), ['1.avif', '2.avif', '3.avif'])
+
+    def test_manifest_location_can_be_chosen(self):
+        manifest = os.path.join(self.output, 'state', 'images.json')
+        self._convert('--formats', 'png', '--manifest', manifest)
+        with open(manifest, encoding='utf-8') as saved:
+            self.assertEqual(sorted(json.load(saved)), ['1.avif', '2.avif', '3.avif'])
+        self.assertFalse(os.path.exists(os.path.join(self.output, '.convert-manifest.json')))
+
+
+@override_settings(PRODUCT_IMAGE_ROOT=os.path.join(settings.BASE_DIR, 'static'))
+class UpdateThumbnailsCommandTests(TestCase):
+    def setUp(self):
+        # static/image/products ships both N.avif and N.png, except the ones we point past the end
+        self.products = [
+            Product.objects.create(title=f"Sepatu {index}", price=1, thumbnail=f'image/products/{index}.avif')
+            for index in (1, 2, 3)
+        ]
+        self.orphan = Product.objects.create(title="Tanpa PNG", price=1, thumbnail='image/products/9999.avif')
+
+    def _run(self, *args):
+        out = io.StringIO()
+        call_command('update_thumbnails', '--batch-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def _thumbnails(self):
+        return sorted(Product.objects.values_list('thumbnail', flat=True))
+
+    def test_bulk_update_skips_missing_targets(self):
+        with CaptureQueriesContext(connection) as ctx:
+            output = self._run()
+        writes = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "main_product"')]
+        self.assertEqual(len(writes), 2)  # 3 rows in batches of 2
+        self.assertIn("Updated 3 products (.avif -> .png), 1 skipped", output)
+        self.assertIn("9999.png", output)
+        self.assertEqual(self._thumbnails(), [f'image/products/{i}.png' for i in (1, 2, 3)] + ['image/products/9999.avif'])
+
+        # rollback = the same migration the other way round
+        self._run('--from-ext', '.png', '--to-ext', '.avif')
+        self.assertEqual(self._thumbnails(), [f'image/products/{i}.avif' for i in (1, 2, 3, 9999)])
+
+    def test_dry_run_and_strict_write_nothing(self):
+        before = self._thumbnails()
+        self.assertIn("Would update 3 products", self._run('--dry-run'))
+        with self.assertRaises(CommandError):
+            self._run('--strict')
+        self.assertEqual(self._thumbnails(), before)
+
+
+def _upstream(body, content_type='image/png', status=200, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update({'Content-Type': content_type, **(headers or {})})
+    response.raw = io.BytesIO(body)
+    return response
+
+
+class ProxyImageTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        self.settings_override = override_settings(IMAGE_PROXY_CACHE_DIR=self.cache_dir)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def _get(self, url, **headers):
+        return self.client.get(reverse('main:proxy_image'), {'url': url}, **headers)
+
+    def test_local_file_is_streamed_with_validators(self):
+        response = self._get('http://localhost:8000/static/image/products/1.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Access-Control-Allow-Origin'], '*')
+        b''.join(response.streaming_content)
+
+        again = self._get('http://localhost:8000/static/image/products/1.png', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        since = self._get('http://localhost:8000/static/image/products/1.png',
+                          HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+    def test_paths_outside_static_are_not_served(self):
+        self.assertEqual(self._get('http://localhost/static/../manage.py').status_code, 404)
+        self.assertEqual(self._get('http://localhost/static/image/products/nope.png').status_code, 404)
+
+    def test_remote_image_is_fetched_once_and_revalidated_locally(self):
+        with mock.patch('main.image_proxy.http_session.get', return_value=_upstream(b'PNGDATA')) as upstream:
+            first = self._get('https://cdn.example.com/shoe.png')
+            self.assertEqual(b''.join(first.streaming_content), b'PNGDATA')
+            second = self._get('https://cdn.example.com/shoe.png')
+            b''.join(second.streaming_content)
+            cached = self._get('https://cdn.example.com/shoe.png', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(upstream.call_count, 1)
+        self.assertEqual(cached.status_code, 304)
+
+    def test_remote_errors_and_non_images_are_rejected(self):
+        with mock.patch('main.image_proxy.http_session.get', return_value=_upstream(b'<html>', 'text/html')):
+            self.assertEqual(self._get('https://example.com/page').status_code, 502)
+        with mock.patch('main.image_proxy.http_session.get', side_effect=requests.ConnectionError('down')):
+            self.assertEqual(self._get('https://example.com/a.png').status_code, 502)
+        self.assertEqual(self._get('file:///etc/passwd').status_code, 502)
+
+    def test_dead_origin_is_not_asked_again_on_every_request(self):
+        cache = RemoteImageCache(directory=self.cache_dir, ttl=3600)
+        url = 'https://cdn.example.com/stale.png'
+        with mock.patch('main.image_proxy.http_session.get',
+                        return_value=_upstream(b'OLD', headers={'ETag': '"v1"'})):
+            cache.get(url)
+        meta_path = cache._paths(url)[1]
+        meta = cache._read_meta(meta_path)
+        meta['fetched_at'] -= 2 * 3600  # expired
+        cache._write_json(meta_path, meta)
+
+        with mock.patch('main.image_proxy.http_session.get', side_effect=requests.ConnectionError('down')) as upstream:
+            for _ in range(3):
+                with open(cache.get(url).path, 'rb') as body:
+                    self.assertEqual(body.read(), b'OLD')
+        self.assertEqual(upstream.call_count, 1)
+
+        # once the short negative window is over the origin is tried again
+        with mock.patch('main.image_proxy.time.time', return_value=time.time() + 61), \
+                mock.patch('main.image_proxy.http_session.get', side_effect=requests.ConnectionError('down')) as upstream:
+            cache.get(url)
+        self.assertEqual(upstream.call_count, 1)
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = RemoteImageCache(directory=self.cache_dir, max_bytes=25)
+        with mock.patch('main.image_proxy.http_session.get', side_effect=lambda *a, **k: _upstream(b'x' * 10)):
+            for name in ('a', 'b'):
+                cache.get(f'https://cdn.example.com/{name}.png')
+            os.utime(cache._paths('https://cdn.example.com/b.png')[1], (0, 0))  # b is now the oldest
+            cache.get('https://cdn.example.com/c.png')
+
+        self.assertFalse(os.path.exists(cache._paths('https://cdn.example.com/b.png')[0]))
+        self.assertTrue(os.path.exists(cache._paths('https://cdn.example.com/a.png')[0]))
+        self.assertTrue(os.path.exists(cache._paths('https://cdn.example.com/c.png')[0]))
+
+
+def _avif_upload(color='red', name='sepatu.avif'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), color).save(buffer, 'AVIF')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/avif')
+
+
+@override_settings(STORAGES={
+    **settings.STORAGES,
+    'product_images': {'BACKEND': 'main.storage.InMemoryProductImageStorage'},
+})
+class ProductImageStorageTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', password='12345')
+        self.client.force_login(self.seller)
+        Profile.objects.filter(user=self.seller).update(role='seller')
+
+    def _create(self, title, image):
+        return self.client.post(reverse('main:create_product'), {
+            'title': title, 'price': 250000, 'category': "Men's Shoes", 'stock': 5, 'thumbnail': image,
+        })
+
+    def test_upload_is_named_by_content_and_stored_once(self):
+        self.assertEqual(self._create("Sepatu A", _avif_upload()).status_code, 302)
+        self.assertEqual(self._create("Sepatu B", _avif_upload(name='lain.avif')).status_code, 302)
+        self._create("Sepatu C", _avif_upload('blue'))
+
+        names = dict(Product.objects.values_list('title', 'thumbnail'))
+        self.assertRegex(names["Sepatu A"], r'^image/products/([0-9a-f]{2})/\1[0-9a-f]{62}\.avif$')
+        self.assertEqual(names["Sepatu A"], names["Sepatu B"])
+        self.assertNotEqual(names["Sepatu A"], names["Sepatu C"])
+
+        storage = storages['product_images']
+        folders, _ = storage.listdir('image/products')
+        self.assertEqual(sum(len(storage.listdir(f'image/products/{f}')[1]) for f in folders), 2)
+
+    def test_filesystem_backend_writes_atomically_and_dedupes(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        storage = ProductImageStorage(location=root, base_url='/media/')
+
+        name = storage.save_hashed(ContentFile(b'avif-bytes', name='x.AVIF'))
+        mtime = os.path.getmtime(storage.path(name))
+        self.assertEqual(storage.save_hashed(ContentFile(b'avif-bytes', name='y.avif')), name)
+        self.assertEqual(os.path.getmtime(storage.path(name)), mtime)
+        self.assertEqual(storage.listdir('image/products/.incoming'), ([], []))
+        with storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'avif-bytes')
+        self.assertEqual(storage.url(name), f'/media/{name}')
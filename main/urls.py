@@ -1,5 +1,5 @@
 from django.urls import path
-from main.views import show_main, create_product, show_product, show_xml, show_json, show_xml_by_id, show_json_by_id, register, login_user, logout_user, edit_product, delete_product, load_dataset, proxy_image, create_product_flutter, edit_product_flutter, delete_product_flutter
+from main.views import show_main, create_product, show_product, show_xml, show_json, show_json_feed, show_xml_by_id, show_json_by_id, register, login_user, logout_user, edit_product, delete_product, load_dataset, proxy_image, create_product_flutter, edit_product_flutter, delete_product_flutter
 
 app_name = 'main'
 
@@ -9,6 +9,7 @@ urlpatterns = [
     path('product/<str:id>/', show_product, name='show_product'),
     path('xml/', show_xml, name='show_xml'),
     path('json/', show_json, name='show_json'),
+    path('json/feed/', show_json_feed, name='show_json_feed'),
     path('xml/<str:product_id>/', show_xml_by_id, name='show_xml_by_id'),
     path('json/<str:product_id>/', show_json_by_id, name='show_json_by_id'),
     path('register/', register, name='register'),
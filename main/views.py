@@ -1,7 +1,19 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from main.forms import ProductForm
 from main.models import Product
-from django.http import HttpResponse
+from main.catalog import catalog_queryset, serialize_product, feed_page, FEED_DEFAULT_PAGE_SIZE, FEED_MAX_PAGE_SIZE
+from main.catalog import stream_catalog_json, stream_catalog_ndjson, stream_catalog_xml, review_page
+from main.images import clear_renditions
+from main.storage import product_image_storage
+from main.image_proxy import RemoteImageError, file_etag, local_image, remote_cache
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from urllib.parse import urlparse
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.core import serializers
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth import authenticate, login, logout
@@ -24,7 +36,6 @@ from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.conf import settings
 from main.models import Product
-import requests
 
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.html import strip_tags
@@ -33,6 +44,46 @@ import json
 from django.http import JsonResponse
 
 
+HOME_PAGE_SIZE = 24
+PRODUCT_CARD_CACHE_TIMEOUT = 60 * 60
+
+
+def _viewer_role(product, user, role):
+    if not user.is_authenticated:
+        return 'anonymous'
+    if product.user_id == user.id:
+        return 'owner'
+    return role
+
+
+def product_card_cache_key(product, viewer_role):
+    return f"product_card:{product.id}:{product.updated_at.timestamp()}:{viewer_role}"
+
+
+def render_product_cards(products, user):
+    """
+    Render card_product.html for each product, reusing cached fragments.
+    The key is product id + updated_at + viewer role, so an edit or a different
+    viewer (owner/admin/buyer/anonymous) never sees a stale card.
+    """
+    role = user.profile.role if user.is_authenticated and hasattr(user, 'profile') else None
+    keys = [product_card_cache_key(p, _viewer_role(p, user, role)) for p in products]
+    cached = cache.get_many(keys)
+
+    cards = []
+    missing = {}
+    for product, key in zip(products, keys):
+        card = cached.get(key)
+        if card is None:
+            card = render_to_string('card_product.html', {'product': product, 'user': user})
+            missing[key] = card
+        cards.append(mark_safe(card))
+
+    if missing:
+        cache.set_many(missing, PRODUCT_CARD_CACHE_TIMEOUT)
+    return cards
+
+
 # @login_required(login_url='/login')
 def show_main(request):
     filter_type = request.GET.get("filter", "all")  # default 'all'
@@ -43,9 +94,16 @@ def show_main(request):
     else:
         product_list = Product.objects.filter(user=request.user, is_auction=False)
 
+    # Stable order so pages do not shuffle between requests
+    paginator = Paginator(product_list.order_by('-count_sold', '-id'), HOME_PAGE_SIZE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
     context = {
         'name': request.user.username,
-        'product_list': product_list,
+        'product_list': page_obj,
+        'page_obj': page_obj,
+        'product_cards': render_product_cards(list(page_obj), request.user),
+        'filter_type': filter_type,
         'last_login': request.COOKIES.get('last_login', 'Never')
     }
     return render(request, "main.html",context)
@@ -61,28 +119,12 @@ def create_product(request):
         if form.is_valid():
             product = form.save(commit=False)
             product.user = request.user
-            product.save()
 
-            # Save image as static/image/products/<index>.avif
+            # Simpan gambar dengan nama hash isi file (image/products/ab/<sha256>.avif)
             uploaded_file = request.FILES.get('thumbnail')
             if uploaded_file:
-                products_dir = os.path.join(settings.BASE_DIR, 'static', 'image', 'products')
-                os.makedirs(products_dir, exist_ok=True)
-
-                # Find the next available index
-                existing_files = [f for f in os.listdir(products_dir) if f.endswith('.avif')]
-                next_index = len(existing_files) + 1
-                new_filename = f"{next_index}.avif"
-                new_path = os.path.join(products_dir, new_filename)
-
-                # Save uploaded file
-                with open(new_path, 'wb+') as destination:
-                    for chunk in uploaded_file.chunks():
-                        destination.write(chunk)
-
-                # Update product thumbnail path
-                product.thumbnail = f"image/products/{new_filename}"
-                product.save()
+                product.thumbnail = product_image_storage().save_hashed(uploaded_file)
+            product.save()
 
             return redirect('main:show_main')
     else:
@@ -93,71 +135,68 @@ def create_product(request):
 @login_required(login_url='/login')
 def show_product(request, id):
     product = get_object_or_404(Product, pk=id)
+    reviews = review_page(product, request.GET.get('reviews'))
 
     context = {
-        'product': product
+        'product': product,
+        'reviews': reviews,
+        'review_count': reviews.paginator.count,
     }
 
     return render(request, "product_detail.html", context)
 
+def _wants_stream(request):
+    return request.GET.get('stream', '').lower() in ('1', 'true', 'yes')
+
 def show_xml(request):
      # Exclude auction products - they should only appear in auction list
+     if _wants_stream(request):
+         return StreamingHttpResponse(stream_catalog_xml(), content_type="application/xml")
+
      product_list = Product.objects.filter(is_auction=False)
      xml_data = serializers.serialize("xml", product_list)
      return HttpResponse(xml_data, content_type="application/xml")
 
 def show_json(request):
     # Exclude auction products - they should only appear in auction list
-    product_list = Product.objects.filter(is_auction=False)
-    # Custom serialization to handle thumbnail properly
-    products_data = []
-    for product in product_list:
-        # Get thumbnail value - if it's an ImageField, get the name
-        thumbnail_value = product.thumbnail.name if product.thumbnail else ''
-
-        products_data.append({
-            'model': 'main.product',
-            'pk': str(product.id),
-            'fields': {
-                'title': product.title,
-                'price': int(product.price),
-                'category': product.category,
-                'thumbnail': thumbnail_value,
-                'count_sold': product.count_sold,
-                'stock': product.stock,
-                'is_auction': product.is_auction,
-                'auction_increment': int(product.auction_increment) if product.auction_increment else None,
-                'auction_end_time': product.auction_end_time.isoformat() if product.auction_end_time else None,
-                'user': product.user.id if product.user else None,
-                'comments': [
-                    {
-                        'comment_id': str(comment.id),
-                        'comment_rating': comment.rating,
-                        'comment_content': comment.content,
-                        'comment_author_id': str(comment.author.id) if comment.author else None,
-                        'comment_author_username': comment.author.username if comment.author else None,
-                        'comment_author_role': comment.author.profile.role if comment.author and hasattr(comment.author, 'profile') else None,
-                        'comment_created_at': comment.created_at.isoformat(),
-                        'comment_order_item_id': str(comment.order_item.id) if comment.order_item else None,
-                        'replies': [
-                            {
-                                'reply_id': str(reply.id),
-                                'reply_content': reply.content,
-                                'reply_author_id': str(reply.author.id) if reply.author else None,
-                                'reply_author_username': reply.author.username if reply.author else None,
-                                'reply_author_role': reply.author.profile.role if reply.author and hasattr(reply.author, 'profile') else None,
-                                'reply_created_at': reply.created_at.isoformat(),
-                            }
-                            for reply in comment.replies.all()
-                        ]
-                    }
-                    for comment in product.comments.all()
-                ]
-            }
-        })
+    if request.GET.get('format') == 'ndjson':
+        return StreamingHttpResponse(stream_catalog_ndjson(), content_type="application/x-ndjson")
+    if _wants_stream(request):
+        return StreamingHttpResponse(stream_catalog_json(), content_type="application/json")
+
+    product_list = catalog_queryset()
+    products_data = [serialize_product(product) for product in product_list]
 
     return JsonResponse(products_data, safe=False)
 
+def show_json_feed(request):
+    """
+    Cursor-paginated version of /json/ for the mobile feed.
+    Query params: cursor (from the previous page), page_size, comments=0 to skip review trees.
+    """
+    try:
+        page_size = int(request.GET.get('page_size', FEED_DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'page_size must be a number'}, status=400)
+    page_size = max(1, min(page_size, FEED_MAX_PAGE_SIZE))
+
+    include_comments = request.GET.get('comments', '1').lower() not in ('0', 'false', 'no')
+
+    try:
+        products, next_cursor = feed_page(
+            cursor=request.GET.get('cursor'),
+            page_size=page_size,
+            include_comments=include_comments,
+        )
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    return JsonResponse({
+        'products': [serialize_product(product, include_comments=include_comments) for product in products],
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+    })
+
 def show_xml_by_id(request, product_id):
    try:
        product_item = Product.objects.filter(pk=product_id)
@@ -220,6 +259,8 @@ def edit_product(request, id):
     product = get_object_or_404(Product, pk=id)
     form = ProductForm(request.POST or None, request.FILES or None, instance=product)
     if form.is_valid() and request.method == 'POST':
+        if 'thumbnail' in form.changed_data:
+            clear_renditions(product)
         form.save()
         return redirect('main:show_main')
 
@@ -248,7 +289,7 @@ def delete_product(request, id):
 
 @user_passes_test(lambda u: u.is_authenticated and (u.is_superuser or u.profile.role == 'admin'))
 def load_dataset(request):
-    csv_path = os.path.join(settings.BASE_DIR, 'static', 'data', 'products.csv')
+    csv_path = getattr(settings, 'PRODUCT_DATASET_CSV', os.path.join(settings.BASE_DIR, 'static', 'data', 'products.csv'))
     image_dir = 'image/products'  # relative path inside static/
 
     if not os.path.exists(csv_path):
@@ -268,7 +309,7 @@ def load_dataset(request):
             # Clean price (e.g. "2.379.000" → 2379000)
             price_clean = int(str(price).replace('.', '').replace(',', '').strip())
 
-            Product.objects.get_or_create(
+            product, created = Product.objects.get_or_create(
                 title=product_name.strip(),
                 price=price_clean,
                 category=category.strip(),
@@ -280,71 +321,65 @@ def load_dataset(request):
             )
             created_count += 1
 
-    return JsonResponse({'message': f'{created_count} products loaded successfully!'})
+    # Renditions are not generated per row here (thousands of encodes inside one request);
+    # the operator runs the batch command afterwards.
+    return JsonResponse({
+        'message': f'{created_count} products loaded successfully! '
+                   'Run `python manage.py generate_renditions` to build the thumbnail renditions.'
+    })
+
+def _cors(response):
+    response['Access-Control-Allow-Origin'] = '*'
+    response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
+    response['Access-Control-Allow-Headers'] = '*'
+    return response
+
+def _serve_image(request, path, content_type, etag, last_modified, cache_control):
+    # 304 kalau browser sudah punya versi yang sama; selain itu stream file tanpa membacanya ke memori
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if response is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    return _cors(response)
 
 @csrf_exempt
 def proxy_image(request):
+    """
+    Image proxy for the Flutter Web client (CORS). /static/ and /media/ URLs are streamed from disk,
+    other URLs go through the on-disk remote_cache; both answer If-None-Match /
+    If-Modified-Since with 304.
+    """
     # Handle OPTIONS request for CORS preflight
     if request.method == 'OPTIONS':
-        response = HttpResponse()
-        response['Access-Control-Allow-Origin'] = '*'
-        response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
-        response['Access-Control-Allow-Headers'] = '*'
-        return response
+        return _cors(HttpResponse())
 
     image_url = request.GET.get('url')
     if not image_url:
         return HttpResponse('No URL provided', status=400)
 
+    parsed_url = urlparse(image_url)
+
+    # Extract the path after /static/ (seeded images) or /media/ (uploads, renditions)
+    local_prefix = next((prefix for prefix in ('/static/', '/media/') if prefix in parsed_url.path), None)
+    if local_prefix:
+        relative_path = parsed_url.path.split(local_prefix, 1)[1]
+        found = local_image(relative_path)
+        if found is None:
+            return HttpResponse('Image not found', status=404)
+        path, content_type, stat = found
+        return _serve_image(request, path, content_type, file_etag(stat), stat.st_mtime,
+                            'public, max-age=31536000')
+
+    # Fallback to fetching from external URL
     try:
-        # Parse the URL to get the static file path
-        from urllib.parse import urlparse
-        parsed_url = urlparse(image_url)
-
-        # Extract the path after /static/
-        if '/static/' in parsed_url.path:
-            relative_path = parsed_url.path.split('/static/', 1)[1]
-            file_path = os.path.join(settings.BASE_DIR, 'static', relative_path)
-
-            # Check if file exists
-            if os.path.exists(file_path):
-                # Determine content type
-                content_type = 'image/jpeg'
-                if file_path.endswith('.avif'):
-                    content_type = 'image/avif'
-                elif file_path.endswith('.png'):
-                    content_type = 'image/png'
-                elif file_path.endswith('.jpg') or file_path.endswith('.jpeg'):
-                    content_type = 'image/jpeg'
-                elif file_path.endswith('.webp'):
-                    content_type = 'image/webp'
-
-                # Read and return the file
-                with open(file_path, 'rb') as f:
-                    response = HttpResponse(f.read(), content_type=content_type)
-                    response['Access-Control-Allow-Origin'] = '*'
-                    response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
-                    response['Access-Control-Allow-Headers'] = '*'
-                    response['Cache-Control'] = 'public, max-age=31536000'
-                    return response
-            else:
-                return HttpResponse('Image not found', status=404)
-        else:
-            # Fallback to fetching from external URL
-            response = requests.get(image_url, timeout=10)
-            response.raise_for_status()
-            http_response = HttpResponse(
-                response.content,
-                content_type=response.headers.get('Content-Type', 'image/jpeg')
-            )
-            http_response['Access-Control-Allow-Origin'] = '*'
-            http_response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
-            http_response['Access-Control-Allow-Headers'] = '*'
-            return http_response
+        cached = remote_cache.get(image_url)
+    except RemoteImageError as e:
+        return _cors(HttpResponse(f'Error fetching image: {e}', status=502))
+    return _serve_image(request, cached.path, cached.content_type, cached.etag, cached.last_modified,
+                        f'public, max-age={remote_cache.ttl}')
 
-    except Exception as e:
-        return HttpResponse(f'Error fetching image: {str(e)}', status=500)
-    
 
 @csrf_exempt
 def create_product_flutter(request):
@@ -441,6 +476,7 @@ def edit_product_flutter(request, id):
         thumbnail = data.get("thumbnail", "")
         if thumbnail:
             product.thumbnail = thumbnail
+            clear_renditions(product)
         product.save()
 
         return JsonResponse({"status": "success"}, status=200)
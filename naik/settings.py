@@ -171,6 +171,19 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static'
 ]
 
+# Product images uploaded by sellers (stored by content hash) and the generated
+# thumbnail renditions live in media, not static/: whitenoise only serves what
+# collectstatic copied at deploy time. Swap the backend for object storage (or
+# main.storage.InMemoryProductImageStorage in tests).
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'product_images': {
+        'BACKEND': 'main.storage.ProductImageStorage',
+        'OPTIONS': {'location': MEDIA_ROOT, 'base_url': MEDIA_URL},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,218 @@
+import heapq
+import re
+import threading
+import time
+
+from django.core.cache import cache
+
+from main.models import Product
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+
+# Suggestions cached per trie node; deeper requests than this are computed on the fly
+TOP_K = MAX_LIMIT
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Shared version stamp: every product save/delete (in any worker) bumps it and a worker
+# whose copy was built from an older version rebuilds on the next lookup.
+VERSION_CACHE_KEY = 'search:autocomplete:version'
+# Upper bound on staleness when the cache is not shared between workers (LocMemCache)
+MAX_INDEX_AGE = 300
+
+
+def words(text):
+    return _WORD_RE.findall((text or '').lower())
+
+
+class _Node:
+    __slots__ = ('children', 'ids', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()
+        self.top = None  # cached best product ids by count_sold, None = stale
+
+
+class PrefixIndex:
+    """
+    In-memory trie over the words of product titles and categories.
+    Every node keeps the ids of products having a word with that prefix, plus a cached
+    top-K by count_sold, so a lookup is a walk down the trie and a slice.
+    Each worker keeps its own copy; it is rebuilt when the shared version stamp in the
+    cache moves (a save/delete in another worker) or after MAX_INDEX_AGE seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._root = _Node()
+        self._entries = {}  # product id -> (title, category, count_sold)
+        self._categories = {}  # category -> number of products
+        self.built = False
+        self.version = None
+        self.built_at = 0.0
+
+    def build(self, products):
+        """(Re)build from an iterable of (id, title, category, count_sold)."""
+        with self._lock:
+            self._root = _Node()
+            self._entries = {}
+            self._categories = {}
+            for product_id, title, category, count_sold in products:
+                self._add(product_id, title, category, count_sold)
+            self.built = True
+
+    def _is_current(self, version):
+        return self.built and self.version == version and time.monotonic() - self.built_at < MAX_INDEX_AGE
+
+    def ensure_built(self):
+        version = shared_version()
+        if self._is_current(version):
+            return
+        with self._lock:
+            if not self._is_current(version):
+                self.build(
+                    Product.objects.filter(is_auction=False)
+                    .values_list('id', 'title', 'category', 'count_sold')
+                    .iterator()
+                )
+                self.version = version
+                self.built_at = time.monotonic()
+
+    def mark_changed(self):
+        """
+        Bump the shared version after a change was applied to this copy. If this copy
+        was current, it stays current; any other worker rebuilds on its next lookup.
+        """
+        new_version = bump_version()
+        with self._lock:
+            if self.built and self.version == new_version - 1:
+                self.version = new_version
+
+    def _nodes_for(self, title, category):
+        seen = set()
+        for word in words(title) + words(category):
+            node = self._root
+            for char in word:
+                node = node.children.setdefault(char, _Node())
+                if id(node) not in seen:
+                    seen.add(id(node))
+                    yield node
+
+    def _add(self, product_id, title, category, count_sold):
+        self._entries[product_id] = (title, category, count_sold)
+        if category:
+            self._categories[category] = self._categories.get(category, 0) + 1
+        for node in self._nodes_for(title, category):
+            node.ids.add(product_id)
+            top = node.top
+            if top is not None and (len(top) < TOP_K or count_sold >= self._entries[top[-1]][2]):
+                node.top = None
+
+    def _remove(self, product_id):
+        title, category, _ = self._entries.pop(product_id)
+        if category:
+            self._categories[category] -= 1
+            if not self._categories[category]:
+                del self._categories[category]
+        for node in self._nodes_for(title, category):
+            node.ids.discard(product_id)
+            if node.top is not None and product_id in node.top:
+                node.top = None
+
+    def update(self, product_id, title, category, count_sold):
+        with self._lock:
+            if not self.built:
+                return
+            if product_id in self._entries:
+                if self._entries[product_id] == (title, category, count_sold):
+                    return
+                self._remove(product_id)
+            self._add(product_id, title, category, count_sold)
+
+    def reload(self, product_id):
+        """Re-read one product from the database (used when the saved values were expressions)."""
+        self.reload_many([product_id])
+
+    def reload_many(self, product_ids):
+        """Re-read several products in one query; the ones gone or now auctions are dropped."""
+        if not self.built:
+            return
+        rows = {
+            product_id: (title, category, count_sold)
+            for product_id, title, category, count_sold in Product.objects.filter(pk__in=product_ids, is_auction=False)
+            .values_list('id', 'title', 'category', 'count_sold')
+        }
+        for product_id in product_ids:
+            if product_id in rows:
+                self.update(product_id, *rows[product_id])
+            else:
+                self.remove(product_id)
+
+    def remove(self, product_id):
+        with self._lock:
+            if self.built and product_id in self._entries:
+                self._remove(product_id)
+
+    def _find(self, prefix):
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _top(self, node):
+        if node.top is None:
+            node.top = heapq.nlargest(TOP_K, node.ids, key=lambda pk: self._entries[pk][2])
+        return node.top
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        """
+        Top products whose title/category words start with every word of query
+        (the last word may be partial), best sellers first, plus matching categories.
+        """
+        query_words = words(query)
+        if not query_words:
+            return [], []
+
+        with self._lock:
+            nodes = [self._find(word) for word in query_words]
+            if any(node is None for node in nodes):
+                return [], []
+
+            if len(nodes) == 1:
+                ranked = self._top(nodes[0])[:limit]
+            else:
+                nodes.sort(key=lambda node: len(node.ids))
+                matches = set(nodes[0].ids).intersection(*(node.ids for node in nodes[1:]))
+                ranked = heapq.nlargest(limit, matches, key=lambda pk: self._entries[pk][2])
+
+            products = [
+                {'id': str(pk), 'title': self._entries[pk][0], 'category': self._entries[pk][1],
+                 'count_sold': self._entries[pk][2]}
+                for pk in ranked
+            ]
+            categories = [
+                category for category in self._categories
+                if all(any(word.startswith(q) for word in words(category)) for q in query_words)
+            ]
+        return products, sorted(categories)
+
+
+def shared_version():
+    cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+    return cache.get(VERSION_CACHE_KEY, 1)
+
+
+def bump_version():
+    try:
+        return cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        # key evicted in the meantime
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+        return cache.incr(VERSION_CACHE_KEY)
+
+
+prefix_index = PrefixIndex()
@@ -0,0 +1,91 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, Count, IntegerField, Q, Value, When
+
+# Price buckets in IDR: (lower bound inclusive, upper bound exclusive; None = open ended)
+PRICE_BUCKETS = [
+    (0, 500000),
+    (500000, 1000000),
+    (1000000, 2000000),
+    (2000000, 5000000),
+    (5000000, None),
+]
+
+# Facet counts change only when products do, a short TTL is enough for the sidebar
+FACET_CACHE_TIMEOUT = 60
+
+
+def _bucket_expression():
+    whens = [
+        When(price__lt=upper, then=Value(position))
+        for position, (_, upper) in enumerate(PRICE_BUCKETS)
+        if upper is not None
+    ]
+    return Case(*whens, default=Value(len(PRICE_BUCKETS) - 1), output_field=IntegerField())
+
+
+def _price_range_q(min_price, max_price):
+    condition = Q()
+    if min_price:
+        condition &= Q(price__gte=min_price)
+    if max_price:
+        condition &= Q(price__lte=max_price)
+    return condition
+
+
+def compute_facets(products, category='', min_price='', max_price=''):
+    """
+    Category counts and price-bucket counts for products matching the text query.
+    One GROUP BY (category, price bucket, inside selected price range) query serves both:
+    category counts respect the price filter, bucket counts respect the category filter,
+    and neither facet filters itself so the sidebar can still offer the alternatives.
+    """
+    price_range = _price_range_q(min_price, max_price)
+    if price_range:
+        in_price_range = Case(When(price_range, then=Value(True)), default=Value(False), output_field=BooleanField())
+    else:
+        in_price_range = Value(True, output_field=BooleanField())
+
+    rows = (
+        products
+        .annotate(price_bucket=_bucket_expression(), in_price_range=in_price_range)
+        .values('category', 'price_bucket', 'in_price_range')
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+
+    category_counts = {}
+    bucket_counts = [0] * len(PRICE_BUCKETS)
+    selected_category = category.lower()
+    for row in rows:
+        if row['in_price_range']:
+            category_counts[row['category']] = category_counts.get(row['category'], 0) + row['total']
+        if not selected_category or (row['category'] or '').lower() == selected_category:
+            bucket_counts[row['price_bucket']] += row['total']
+
+    return {
+        'categories': [
+            {'value': value, 'count': count}
+            for value, count in sorted(category_counts.items(), key=lambda item: (-item[1], item[0] or ''))
+        ],
+        'price_buckets': [
+            {'min': lower, 'max': upper, 'count': count}
+            for (lower, upper), count in zip(PRICE_BUCKETS, bucket_counts)
+        ],
+    }
+
+
+def facet_cache_key(query, category, min_price, max_price):
+    raw = '\x1f'.join([query.lower(), category.lower(), str(min_price), str(max_price)])
+    return 'search:facets:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def cached_facets(products, query='', category='', min_price='', max_price=''):
+    """compute_facets() memoized per (query, filters) for FACET_CACHE_TIMEOUT seconds."""
+    key = facet_cache_key(query, category, min_price, max_price)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(products, category, min_price, max_price)
+        cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
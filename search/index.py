@@ -0,0 +1,140 @@
+import re
+import uuid
+
+from django.db import connection
+
+# SQLite: FTS5 virtual table with the trigram tokenizer (substring + typo-tolerant matching)
+FTS_TABLE = 'search_product_fts'
+# PostgreSQL: tsvector + pg_trgm document table, both GIN indexed
+PG_TABLE = 'search_product_document'
+
+# Ranked candidates pulled from the index per query, before filters and pagination
+MAX_CANDIDATES = 500
+
+# Share of the query's trigrams a product must contain to count as a (fuzzy) match
+MIN_SIMILARITY = 0.5
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_supported():
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def trigrams(text):
+    """Trigram set of every word (3+ chars) in text, lowercased."""
+    grams = set()
+    for word in _WORD_RE.findall(text.lower()):
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+def similarity(query_grams, text):
+    """Fraction of the query trigrams found in text (1.0 = every trigram present)."""
+    if not query_grams:
+        return 0.0
+    return len(query_grams & trigrams(text)) / len(query_grams)
+
+
+def fts_rowid(product_id):
+    """
+    Stable 64-bit FTS rowid for a product UUID, so updates and deletes hit the rowid
+    b-tree instead of scanning the UNINDEXED product_id column.
+    """
+    return int.from_bytes(product_id.bytes[:8], 'big', signed=True)
+
+
+def _document(title, category):
+    return f"{title or ''} {category or ''}".strip()
+
+
+def index_product(product_id, title, category):
+    """Insert or refresh one product in the search index."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            rowid = fts_rowid(product_id)
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [rowid])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, product_id, title, category) VALUES (%s, %s, %s, %s)",
+                [rowid, product_id.hex, title or '', category or ''],
+            )
+        elif connection.vendor == 'postgresql':
+            document = _document(title, category)
+            cursor.execute(
+                f"INSERT INTO {PG_TABLE} (product_id, document, search_vector) "
+                f"VALUES (%s, %s, to_tsvector('simple', %s)) "
+                f"ON CONFLICT (product_id) DO UPDATE "
+                f"SET document = EXCLUDED.document, search_vector = EXCLUDED.search_vector",
+                [product_id, document, document],
+            )
+
+
+def remove_product(product_id):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [fts_rowid(product_id)])
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"DELETE FROM {PG_TABLE} WHERE product_id = %s", [product_id])
+
+
+def rebuild_index(products):
+    """Replace the whole index with the given products (iterable of (id, title, category))."""
+    count = 0
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"DELETE FROM {PG_TABLE}")
+    for product_id, title, category in products:
+        index_product(product_id, title, category)
+        count += 1
+    return count
+
+
+def _sqlite_ranked_ids(query, limit):
+    query_grams = trigrams(query)
+    if not query_grams:
+        return None
+
+    # OR over the query trigrams so misspelt words still hit; bm25 puts title hits first
+    match = ' OR '.join('"{}"'.format(gram.replace('"', '""')) for gram in sorted(query_grams))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT product_id, title, category, bm25({FTS_TABLE}, 0.0, 10.0, 2.0) AS rank "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s",
+            [match, limit * 4],
+        )
+        rows = cursor.fetchall()
+
+    scored = []
+    for product_id, title, category, rank in rows:
+        score = similarity(query_grams, _document(title, category))
+        if score >= MIN_SIMILARITY:
+            scored.append((-score, rank, uuid.UUID(product_id)))
+    scored.sort()
+    return [product_id for _, _, product_id in scored[:limit]]
+
+
+def _postgres_ranked_ids(query, limit):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT product_id, ts_rank(search_vector, tsq) + word_similarity(%s, document) AS score "
+            f"FROM {PG_TABLE}, websearch_to_tsquery('simple', %s) AS tsq "
+            f"WHERE search_vector @@ tsq OR %s <%% document "
+            f"ORDER BY score DESC LIMIT %s",
+            [query, query, query, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def ranked_product_ids(query, limit=MAX_CANDIDATES):
+    """
+    Product ids matching query, best match first.
+    Returns None when the index cannot answer (unsupported database or a query with
+    no word of 3+ characters), so callers can fall back to a plain filter.
+    """
+    if connection.vendor == 'sqlite':
+        return _sqlite_ranked_ids(query, limit)
+    if connection.vendor == 'postgresql':
+        return _postgres_ranked_ids(query, limit)
+    return None
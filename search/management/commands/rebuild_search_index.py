@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from main.models import Product
+from search import index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index (FTS5 on SQLite, tsvector/trigram on PostgreSQL)'
+
+    def handle(self, *args, **options):
+        if not index.search_supported():
+            self.stdout.write(self.style.WARNING("Search index is not supported on this database; nothing to do."))
+            return
+
+        with transaction.atomic():
+            count = index.rebuild_index(Product.objects.values_list('id', 'title', 'category').iterator())
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} products."))
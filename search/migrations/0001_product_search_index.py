@@ -0,0 +1,66 @@
+from django.db import migrations
+
+FTS_TABLE = 'search_product_fts'
+PG_TABLE = 'search_product_document'
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(product_id UNINDEXED, title, category, tokenize='trigram')"
+        )
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {PG_TABLE} ("
+            f"product_id uuid PRIMARY KEY REFERENCES main_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            f"document text NOT NULL, "
+            f"search_vector tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_vector_idx ON {PG_TABLE} USING gin (search_vector)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_trgm_idx ON {PG_TABLE} USING gin (document gin_trgm_ops)"
+        )
+    else:
+        return
+
+    # index produk yang sudah ada
+    Product = apps.get_model('main', 'Product')
+    with connection.cursor() as cursor:
+        for product_id, title, category in Product.objects.values_list('id', 'title', 'category').iterator():
+            if connection.vendor == 'sqlite':
+                # rowid = 8 byte pertama UUID, sama seperti search.index.fts_rowid
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE} (rowid, product_id, title, category) VALUES (%s, %s, %s, %s)",
+                    [int.from_bytes(product_id.bytes[:8], 'big', signed=True), product_id.hex, title or '', category or ''],
+                )
+            else:
+                document = f"{title or ''} {category or ''}".strip()
+                cursor.execute(
+                    f"INSERT INTO {PG_TABLE} (product_id, document, search_vector) "
+                    f"VALUES (%s, %s, to_tsvector('simple', %s))",
+                    [product_id, document, document],
+                )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {PG_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,3 +1,55 @@
-from django.db import models
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from main.models import Product
+from main.signals import products_updated
+from . import index
+from .autocomplete import prefix_index
 
-# Create your models here.
+# Index pencarian disimpan di tabel khusus per database (lihat search/index.py) dan
+# trie autocomplete di memori (search/autocomplete.py), jadi app ini tidak punya model
+# sendiri; di sini hanya sinkronisasi keduanya lewat signal.
+
+INDEXED_FIELDS = {'title', 'category'}
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(sender, instance, update_fields=None, **kwargs):
+    _refresh_autocomplete(instance)
+
+    # save(update_fields=['count_sold']) dsb. tidak mengubah isi index
+    if update_fields is not None and not INDEXED_FIELDS.intersection(update_fields):
+        return
+    index.index_product(instance.pk, instance.title, instance.category)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_on_delete(sender, instance, **kwargs):
+    index.remove_product(instance.pk)
+    product_id = instance.pk
+    transaction.on_commit(lambda: _apply_and_bump(prefix_index.remove, product_id))
+
+
+@receiver(products_updated, sender=Product)
+def refresh_updated_products(sender, product_ids, **kwargs):
+    # update() massal (mis. stok dan count_sold saat checkout): satu query, satu kenaikan versi
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: _apply_and_bump(prefix_index.reload_many, product_ids))
+
+
+def _apply_and_bump(change, *args):
+    # perbarui salinan trie di worker ini, lalu naikkan versi supaya worker lain membangun ulang
+    change(*args)
+    prefix_index.mark_changed()
+
+
+def _refresh_autocomplete(product):
+    # trie in-memory diperbarui setelah commit supaya tidak memuat data yang di-rollback
+    product_id, title, category, count_sold = product.pk, product.title, product.category, product.count_sold
+    if not isinstance(count_sold, int):
+        # disimpan dengan ekspresi F(): ambil nilai akhirnya dari database
+        transaction.on_commit(lambda: _apply_and_bump(prefix_index.reload, product_id))
+    elif product.is_auction:
+        transaction.on_commit(lambda: _apply_and_bump(prefix_index.remove, product_id))
+    else:
+        transaction.on_commit(lambda: _apply_and_bump(prefix_index.update, product_id, title, category, count_sold))
@@ -1,6 +1,16 @@
+import io
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase, Client
 from django.urls import reverse
+from checkout.services import place_cart_order
 from main.models import Product, User
+from search import index
+from search.autocomplete import bump_version, prefix_index, shared_version
+from search.facets import cached_facets
+from search.views import SEARCH_PAGE_SIZE
 
 
 class SearchAppTests(TestCase):
@@ -87,3 +97,173 @@ class SearchAppTests(TestCase):
         self.assertNotContains(response, "Nike")
         self.assertNotContains(response, "Jordan")
         self.assertEqual(response.status_code, 200)
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('search:search_products')
+        self.runner = Product.objects.create(title="Pegasus Trail Runner", price=1200000, category="Men's Shoes", count_sold=5)
+        self.slide = Product.objects.create(title="Victori One Slide", price=400000, category="Women's Shoes", count_sold=50)
+
+    def _titles(self, response):
+        return [product.title for product in response.context['products']]
+
+    def test_index_follows_product_save_and_delete(self):
+        self.assertEqual(index.ranked_product_ids("pegasus"), [self.runner.pk])
+
+        self.runner.title = "Vomero Road Runner"
+        self.runner.save()
+        self.assertEqual(index.ranked_product_ids("pegasus"), [])
+        self.assertEqual(index.ranked_product_ids("vomero"), [self.runner.pk])
+
+        self.runner.delete()
+        self.assertEqual(index.ranked_product_ids("vomero"), [])
+
+    def test_search_tolerates_typos(self):
+        response = self.client.get(self.url, {'q': 'pegasuss runer'})
+        self.assertEqual(self._titles(response), ["Pegasus Trail Runner"])
+
+    def test_results_are_ranked_by_match(self):
+        Product.objects.create(title="Trail Cap", price=100000, category="Men's Shoes")
+        response = self.client.get(self.url, {'q': 'trail runner'})
+        self.assertEqual(self._titles(response)[0], "Pegasus Trail Runner")
+
+    def test_results_are_paginated(self):
+        for number in range(SEARCH_PAGE_SIZE + 1):
+            Product.objects.create(title=f"Pegasus {number}", price=1000000, category="Men's Shoes")
+
+        response = self.client.get(self.url, {'q': 'pegasus'})
+        self.assertEqual(len(response.context['products']), SEARCH_PAGE_SIZE)
+        response = self.client.get(self.url, {'q': 'pegasus', 'page': 2})
+        self.assertEqual(len(response.context['products']), 2)
+
+    def test_rebuild_command_restores_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {index.FTS_TABLE}")
+        self.assertEqual(index.ranked_product_ids("slide"), [])
+
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(index.ranked_product_ids("slide"), [self.slide.pk])
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('search:autocomplete')
+        self.index = prefix_index
+        # the index is module-global: put the copy built from other tests' rows back afterwards
+        saved = {name: value for name, value in vars(self.index).items() if name != '_lock'}
+        self.addCleanup(vars(self.index).update, saved)
+        self.index.built = False
+        Product.objects.create(title="Air Max Plus", price=2000000, category="Men's Shoes", count_sold=10)
+        Product.objects.create(title="Air Force 1", price=1500000, category="Women's Shoes", count_sold=90)
+        Product.objects.create(title="Air Zoom Auction", price=1000000, category="Men's Shoes", is_auction=True)
+
+    def _titles(self, **params):
+        return [item['title'] for item in self.client.get(self.url, params).json()['suggestions']]
+
+    def test_suggestions_are_ranked_by_count_sold(self):
+        self.assertEqual(self._titles(q='ai'), ["Air Force 1", "Air Max Plus"])
+        self.assertEqual(self._titles(q='air ma'), ["Air Max Plus"])
+        self.assertEqual(self._titles(q='ai', limit=1), ["Air Force 1"])
+        self.assertEqual(self._titles(q='jordan'), [])
+
+    def test_categories_are_suggested(self):
+        data = self.client.get(self.url, {'q': 'wom'}).json()
+        self.assertEqual(data['categories'], ["Women's Shoes"])
+
+    def test_lookup_does_not_touch_database(self):
+        self.index.ensure_built()
+        with self.assertNumQueries(0):
+            self.assertEqual(self._titles(q='air'), ["Air Force 1", "Air Max Plus"])
+
+    def test_index_follows_save_and_delete(self):
+        self.index.ensure_built()
+        with self.captureOnCommitCallbacks(execute=True):
+            best = Product.objects.create(title="Air Jordan 1", price=3000000, category="Men's Shoes", count_sold=500)
+        self.assertEqual(self._titles(q='air')[0], "Air Jordan 1")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            best.title = "Dunk Low"
+            best.save()
+        self.assertNotIn("Air Jordan 1", self._titles(q='air'))
+        self.assertEqual(self._titles(q='dunk'), ["Dunk Low"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            best.delete()
+        self.assertEqual(self._titles(q='dunk'), [])
+
+    def test_change_in_another_worker_triggers_rebuild(self):
+        self.index.ensure_built()
+        # saved by another worker: its signal handler ran there, only the shared stamp moves
+        Product.objects.create(title="Air Jordan 4", price=3000000, category="Men's Shoes", count_sold=700)
+        self.assertNotIn("Air Jordan 4", self._titles(q='air'))
+        bump_version()
+        self.assertEqual(self._titles(q='air')[0], "Air Jordan 4")
+
+    def test_checkout_reorders_best_sellers_with_one_version_bump(self):
+        self.index.ensure_built()
+        max_plus = Product.objects.get(title="Air Max Plus")
+        Product.objects.filter(pk=max_plus.pk).update(stock=200)
+        buyer = User.objects.create(username='buyer')
+        version = shared_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(place_cart_order(buyer, [(max_plus.pk, 50), (max_plus.pk, 50)]).ok)
+
+        self.assertEqual(shared_version(), version + 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._titles(q='ai'), ["Air Max Plus", "Air Force 1"])
+
+    def test_own_changes_do_not_force_a_rebuild(self):
+        self.index.ensure_built()
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(title="Air Huarache", price=1000000, category="Men's Shoes", count_sold=5)
+        with self.assertNumQueries(0):
+            self.assertIn("Air Huarache", self._titles(q='air'))
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.url = reverse('search:search_api')
+        Product.objects.create(title="Nike Pegasus", price=300000, category="Men's Shoes")
+        Product.objects.create(title="Nike Vomero", price=1500000, category="Men's Shoes")
+        Product.objects.create(title="Nike Invincible", price=1700000, category="Women's Shoes")
+        Product.objects.create(title="Jordan Retro", price=2500000, category="Kids' Shoes")
+
+    def _facets(self, **params):
+        return self.client.get(self.url, params).json()['facets']
+
+    def _categories(self, facets):
+        return {facet['value']: facet['count'] for facet in facets['categories']}
+
+    def _buckets(self, facets):
+        return [bucket['count'] for bucket in facets['price_buckets']]
+
+    def test_counts_per_category_and_price_bucket(self):
+        facets = self._facets(q='nike')
+        self.assertEqual(self._categories(facets), {"Men's Shoes": 2, "Women's Shoes": 1})
+        self.assertEqual(self._buckets(facets), [1, 0, 2, 0, 0])
+
+    def test_each_facet_ignores_its_own_filter(self):
+        facets = self._facets(category="Men's Shoes", min_price=1000000)
+        # categories still listed, counted within the price range
+        self.assertEqual(self._categories(facets), {"Men's Shoes": 1, "Women's Shoes": 1, "Kids' Shoes": 1})
+        # buckets counted within the selected category, across all prices
+        self.assertEqual(self._buckets(facets), [1, 0, 1, 0, 0])
+
+    def test_facets_use_one_query_and_are_cached(self):
+        matched = Product.objects.filter(is_auction=False)
+
+        with self.assertNumQueries(1):
+            first = cached_facets(matched, category="Men's Shoes")
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_facets(matched, category="Men's Shoes"), first)
+
+    def test_results_respect_all_filters(self):
+        data = self.client.get(self.url, {'q': 'nike', 'category': "Men's Shoes", 'max_price': 1000000}).json()
+        self.assertEqual([item['title'] for item in data['results']], ["Nike Pegasus"])
+        self.assertEqual(data['count'], 1)
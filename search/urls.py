@@ -5,4 +5,6 @@ app_name = 'search'
 
 urlpatterns = [
     path('', views.search_products, name='search_products'),
+    path('api/', views.search_api, name='search_api'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
 ]
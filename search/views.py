@@ -1,31 +1,87 @@
 from django.shortcuts import render
 from django.http import JsonResponse
+from django.core.paginator import Paginator
 from main.models import Product
+from . import index
+from .autocomplete import prefix_index, DEFAULT_LIMIT, MAX_LIMIT
+from .facets import cached_facets
 
-def search_products(request):
-    query = request.GET.get('q', '')
-    category = request.GET.get('category', '')
-    min_price = request.GET.get('min_price', '')
-    max_price = request.GET.get('max_price', '')
+SEARCH_PAGE_SIZE = 24
+
+
+def _ranked_page(products, ranked, page_number):
+    """
+    Paginate products by search rank.
+    The index returns ranked ids; filters are applied to those ids in one query and only
+    the current page is loaded as model instances.
+    """
+    allowed = set(products.filter(pk__in=ranked).values_list('pk', flat=True))
+    page_obj = Paginator([pk for pk in ranked if pk in allowed], SEARCH_PAGE_SIZE).get_page(page_number)
+    by_id = products.in_bulk(page_obj.object_list)
+    page_obj.object_list = [by_id[pk] for pk in page_obj.object_list]
+    return page_obj
+
+
+def _canonical_category(category):
+    """Category choice matching category case-insensitively, or None."""
+    for value, _ in Product.CATEGORY_CHOICES:
+        if value.lower() == category.lower():
+            return value
+    return None
+
+
+def _search(params):
+    """
+    Apply q/category/min_price/max_price/page from params.
+    Returns (page_obj, facets, filters) shared by the HTML page and the JSON API.
+    """
+    query = params.get('q', '').strip()
+    category = params.get('category', '')
+    min_price = params.get('min_price', '')
+    max_price = params.get('max_price', '')
+    page_number = params.get('page')
 
     # Exclude auction products - they should only appear in auction list
-    products = Product.objects.filter(is_auction=False)
+    matched = Product.objects.filter(is_auction=False)
+
+    ranked = index.ranked_product_ids(query) if query else None
+    if ranked is not None:
+        matched = matched.filter(pk__in=ranked)
+    elif query:
+        # query terlalu pendek untuk index (atau database tanpa index): filter biasa
+        matched = matched.filter(title__icontains=query)
 
-    if query:
-        products = products.filter(title__icontains=query)
+    products = matched
     if category:
-        products = products.filter(category__iexact=category)
+        canonical = _canonical_category(category)
+        if canonical:
+            # exact match keeps product_category_price_idx usable
+            products = products.filter(category=canonical)
+        else:
+            products = products.filter(category__iexact=category)
     if min_price:
         products = products.filter(price__gte=min_price)
     if max_price:
         products = products.filter(price__lte=max_price)
 
+    if ranked is not None:
+        page_obj = _ranked_page(products, ranked, page_number)
+    else:
+        page_obj = Paginator(products.order_by('-count_sold', '-id'), SEARCH_PAGE_SIZE).get_page(page_number)
+
+    facets = cached_facets(matched, query, category, min_price, max_price)
+    filters = {'query': query, 'category': category, 'min_price': min_price, 'max_price': max_price}
+    return page_obj, facets, filters
+
+
+def search_products(request):
+    page_obj, facets, filters = _search(request.GET)
+
     context = {
-        'products': products,
-        'query': query,
-        'category': category,
-        'min_price': min_price,
-        'max_price': max_price,
+        'products': page_obj,
+        'page_obj': page_obj,
+        'facets': facets,
+        **filters,
     }
 
     # If AJAX, return only the partial HTML for results
@@ -33,3 +89,49 @@ def search_products(request):
         return render(request, 'search/search_results.html', context)
 
     return render(request, 'search/search_results.html', context)
+
+
+def search_api(request):
+    """
+    JSON variant of search_products with facet counts for filter sidebars.
+    GET ?q=&category=&min_price=&max_price=&page=
+    """
+    page_obj, facets, filters = _search(request.GET)
+    return JsonResponse({
+        **filters,
+        'page': page_obj.number,
+        'num_pages': page_obj.paginator.num_pages,
+        'count': page_obj.paginator.count,
+        'results': [
+            {
+                'id': str(product.id),
+                'title': product.title,
+                'price': int(product.price),
+                'category': product.category,
+                'thumbnail': product.thumbnail.name if product.thumbnail else '',
+                'count_sold': product.count_sold,
+            }
+            for product in page_obj
+        ],
+        'facets': facets,
+    })
+
+
+def autocomplete(request):
+    """
+    Saran pencarian (judul produk + kategori) dari trie in-memory, tanpa query database.
+    GET ?q=<prefix>&limit=<n>
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'limit must be a number'}, status=400)
+
+    prefix_index.ensure_built()
+    products, categories = prefix_index.suggest(query, limit=limit)
+    return JsonResponse({
+        'query': query,
+        'suggestions': products,
+        'categories': categories,
+    })
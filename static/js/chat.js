@@ -1,6 +1,6 @@
 // static/js/chat.js
-// Chat client logic: polling, render, send (with image), enter-to-send, smart auto-scroll.
-// Works if template defines `fetchUrl` & `sendUrl` globals OR #messages data-* attrs.
+// Chat client logic: long-poll/polling, render, send (with image), enter-to-send, smart auto-scroll.
+// Works if template defines `fetchUrl` & `sendUrl` (and optional `waitUrl`) globals OR #messages data-* attrs.
 
 (function(){
   // helper to get path from either global or data-attrs
@@ -102,21 +102,68 @@
     }
   }
 
+  // incremental sync: after the first load only ask for messages newer than `cursor`
+  let loadedMessages = [];
+  const loadedIds = new Set();
+  let cursor = null;
+  let firstRender = true;
+
+  function applySync(data){
+    if (!data || !data.messages) return;
+    const fresh = data.messages.filter(m => !loadedIds.has(m.id));
+    if (data.cursor) cursor = data.cursor;
+    if (!firstRender && !fresh.length) return;
+    fresh.forEach(m => loadedIds.add(m.id));
+    loadedMessages = loadedMessages.concat(fresh);
+    firstRender = false;
+    renderMessages(loadedMessages);
+  }
+
   async function fetchMessages(){
     if (!fetchUrl) return;
     try {
-      const resp = await fetch(fetchUrl, { credentials: 'same-origin' });
+      const url = cursor ? `${fetchUrl}?after=${encodeURIComponent(cursor)}` : fetchUrl;
+      const resp = await fetch(url, { credentials: 'same-origin' });
       if (!resp.ok) {
         console.warn('fetchMessages: server returned', resp.status);
         return;
       }
-      const data = await resp.json();
-      if (data && data.messages) renderMessages(data.messages);
+      applySync(await resp.json());
     } catch (e) {
       console.error('fetchMessages error', e);
     }
   }
 
+  // push delivery via long-poll (`waitUrl` global or data-wait-url); polling only without a wait URL
+  const waitUrl = (typeof window.waitUrl !== 'undefined') ? window.waitUrl : msgDiv.dataset.waitUrl;
+  const RETRY_MIN_MS = 1000;
+  const RETRY_MAX_MS = 30000;
+
+  async function waitForMessages(){
+    if (!waitUrl) {
+      setInterval(fetchMessages, 2500);
+      return;
+    }
+    let retryDelay = RETRY_MIN_MS;
+    while (true) {
+      try {
+        // same as LONG_POLL_TIMEOUT on the server (it caps at LONG_POLL_MAX_TIMEOUT)
+        const params = new URLSearchParams({ timeout: '10' });
+        if (cursor) params.set('after', cursor);
+        const resp = await fetch(`${waitUrl}?${params}`, { credentials: 'same-origin' });
+        if (!resp.ok) throw new Error('wait returned ' + resp.status);
+        applySync(await resp.json());
+        retryDelay = RETRY_MIN_MS;
+      } catch (e) {
+        // transient error (deploy, network blip): back off and try the long-poll again
+        console.warn(`long-poll failed, retrying in ${retryDelay}ms`, e);
+        await new Promise(resolve => setTimeout(resolve, retryDelay));
+        retryDelay = Math.min(retryDelay * 2, RETRY_MAX_MS);
+        await fetchMessages();
+      }
+    }
+  }
+
   // Enter to send (Shift+Enter newline)
   textarea.addEventListener('keydown', (e) => {
     if (e.key === 'Enter' && !e.shiftKey) {
@@ -168,7 +215,6 @@
     // can't show UI here without custom element; template may do that
   });
 
-  // start polling
-  fetchMessages();
-  setInterval(fetchMessages, 2500);
+  // start: initial load, then long-poll (falls back to polling every 2.5s)
+  fetchMessages().then(waitForMessages);
 })();